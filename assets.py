@@ -0,0 +1,207 @@
+import re
+import io
+import json
+import base64
+import hashlib
+from os import stat, listdir, remove
+from os.path import join, basename, splitext, exists
+from profiling import stage, count
+from files import write_file
+
+# The social icons (DBLP, Google Scholar, Scopus) are recolored with the sidebar text color.
+# The color found in styles.css and the state of the recolored icons are remembered together
+# with the modification times and sizes of the files, so that on the next build an unchanged
+# styles.css is not parsed again and an icon is rewritten only if the color or the icon changed.
+assets_cache_filename = join('.cache', 'assets.json')
+assets_cache = None
+
+def file_state(filename):
+    file_stat = stat(filename)
+    return [file_stat.st_mtime_ns, file_stat.st_size]
+
+def load_assets_cache():
+    global assets_cache
+    if assets_cache is None:
+        try:
+            with open(assets_cache_filename, 'r') as f:
+                assets_cache = json.load(f)
+                count('bytes read', f.tell())
+        except (OSError, ValueError):
+            assets_cache = {'colors': dict(), 'icons': dict()}
+    return assets_cache
+
+# several generators can work at the same time, so the file is replaced at once
+def save_assets_cache():
+    write_file(assets_cache_filename, json.dumps(assets_cache).encode())
+
+# the color of the sidebar text, which is also used for the social icons
+def sidebar_text_color(styles_filename='styles.css'):
+    cache = load_assets_cache()
+    state = file_state(styles_filename)
+    if styles_filename in cache['colors'] and cache['colors'][styles_filename]['state'] == state:
+        return cache['colors'][styles_filename]['color']
+
+    color = None
+    with open(styles_filename, 'r') as f:
+        styles = f.read()
+    count('bytes read', len(styles))
+    # the comments are removed, otherwise the comment before the color hides it
+    styles = re.sub(r'/\*.*?\*/', '', styles, flags=re.DOTALL)
+    sidebar_rules = re.sub(r'[^\{]*\{([^\}]*)\}',  r'\1', re.search(r'\.sidebar-text a, \.up-button\{[^\}]*\}', styles).group(0)).strip()
+    for line in sidebar_rules.split(';'):
+        if line.split(':')[0].strip() == 'color':
+            color = line.split(':')[1].strip()
+    cache['colors'][styles_filename] = {'state': state, 'color': color}
+    save_assets_cache()
+    return color
+
+def recolored_svg(filename, color):
+    with stage('svg recoloring'):
+        with open(filename, 'r') as f:
+            content = f.read()
+        count('bytes read', len(content))
+        if color is None:
+            return content, content
+        return content, re.sub(r'fill:[^;]*', 'fill:{}'.format(color), content)
+
+# the icon is rewritten only if its color changes, so that several
+# pages can be generated at the same time with the same icons
+def recolor_svg(filename, color):
+    if color is None:
+        return
+    cache = load_assets_cache()
+    if filename in cache['icons'] and cache['icons'][filename] == {'color': color, 'state': file_state(filename)}:
+        return
+    content, recolored = recolored_svg(filename, color)
+    if recolored != content:
+        with open(filename, 'w') as f:
+            f.write(recolored)
+        count('bytes written', len(recolored))
+    cache['icons'][filename] = {'color': color, 'state': file_state(filename)}
+    save_assets_cache()
+
+# How an icon appears on the page, icons is one of
+#  'files': the recolored icon file is linked as an image,
+#  'data-uri': the recolored icon is embedded into the page as an image,
+#  'sprite': the icon is taken from the sprite (see svg_sprite) which is embedded into the page,
+# the last two options save an HTTP request per icon
+icon_modes = ('files', 'data-uri', 'sprite')
+social_icons = ('images/dblp.svg', 'images/google-scholar.svg', 'images/scopus.svg')
+
+def icon_html(filename, color, icons='files', height=20):
+    if icons == 'data-uri':
+        svg = recolored_svg(filename, color)[1]
+        return '<img src="data:image/svg+xml;base64,{}" height="{}">'.format(base64.b64encode(svg.encode()).decode(), height)
+    elif icons == 'sprite':
+        with open(filename, 'r') as f:
+            view_box = re.search(r'viewBox="([^"]*)"', f.read()).group(1).split()
+        width = height * float(view_box[2]) / float(view_box[3])
+        return '<svg height="{}" width="{:g}"><use href="#{}"></use></svg>'.format(height, round(width, 2), symbol_id(filename))
+    else:
+        recolor_svg(filename, color)
+        return '<img src="{}" height="{}">'.format(filename, height)
+
+def symbol_id(filename):
+    return 'icon-' + splitext(basename(filename))[0]
+
+# one hidden SVG with a symbol for each icon, without the editor's metadata
+def svg_sprite(filenames, color):
+    symbols = []
+    for filename in filenames:
+        svg = recolored_svg(filename, color)[1]
+        view_box = re.search(r'viewBox="([^"]*)"', svg).group(1)
+        body = re.search(r'<svg[^>]*>(.*)</svg>', svg, re.DOTALL).group(1)
+        body = re.sub(r'<sodipodi:[^>]*>|<defs[^>]*/>', '', body)
+        body = re.sub(r'\s+(id|[\w-]+:[\w-]+)="[^"]*"', '', body)
+        body = re.sub(r'\s+', ' ', body).strip()
+        symbols.append('<symbol id="{}" viewBox="{}">{}</symbol>'.format(symbol_id(filename), view_box, body))
+    return '<svg xmlns="http://www.w3.org/2000/svg" style="display:none">{}</svg>\n'.format(''.join(symbols))
+
+
+# Responsive images: the logo and the photos in the template are shown much smaller than
+# their files are (especially on phones), so with --responsive-images the resized copies
+# of them are made in images/responsive, both in their own format and in WebP, and the browser
+# picks the smallest copy which is sharp enough, according to the srcset and sizes attributes.
+# The copies are named after the hash of the image, so they are made once for each version
+# of the image, and the browsers do not show an old copy after the image changes.
+# This needs Pillow, without it the images are left as they are.
+# class of the image in the template -> the widths of the copies and the width of the image on the page (see styles.css)
+responsive_images = {
+    'unilogo': ((124, 170, 248, 340), '(max-width: 899px) 124px, 170px'),
+    'photo': ((160, 320), '160px'),
+    'small-photo': ((50, 100, 150), '50px'),
+}
+responsive_folder = 'images/responsive'
+
+def save_resized_image(image, width, filename):
+    from PIL import Image
+    with stage('image resizing'):
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.mode in ('P', 'LA', 'PA') else 'RGB')
+        if width != image.width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        extension = splitext(filename)[1].lower()
+        data = io.BytesIO()
+        if extension == '.webp':
+            image.save(data, 'WEBP', quality=80)
+        elif extension in ('.jpg', '.jpeg'):
+            image.convert('RGB').save(data, 'JPEG', quality=85, optimize=True, progressive=True)
+        else:
+            image.save(data, 'PNG', optimize=True)
+        write_file(filename, data.getvalue())
+        count('images resized')
+
+# the copies of the previous versions of the image are removed
+def remove_old_copies(folder, name, image_hash):
+    pattern = re.compile(re.escape(name) + r'-([0-9a-f]{10})-\d+w\.\w+$')
+    for filename in listdir(folder):
+        match = pattern.match(filename)
+        if match is not None and match.group(1) != image_hash:
+            remove(join(folder, filename))
+
+# returns the srcset of the image in its own format and in WebP,
+# src is relative to the page, which is in output_folder
+def image_srcsets(src, output_folder, widths):
+    from PIL import Image
+    with open(join(output_folder, src), 'rb') as f:
+        data = f.read()
+    count('bytes read', len(data))
+    image_hash = hashlib.sha1(data).hexdigest()[:10]
+    name, extension = splitext(basename(src))
+    folder = join(output_folder, responsive_folder)
+    srcset, webp_srcset = [], []
+    with Image.open(io.BytesIO(data)) as image:
+        # the image is never enlarged, the largest copy has the original size
+        for width in [width for width in widths if width < image.width] + [image.width]:
+            for copy_extension, copy_srcset in ((extension, srcset), ('.webp', webp_srcset)):
+                if width == image.width and copy_extension == extension:
+                    copy_srcset.append('{} {}w'.format(src, width))
+                    continue
+                copy_name = '{}-{}-{}w{}'.format(name, image_hash, width, copy_extension)
+                if not exists(join(folder, copy_name)):
+                    save_resized_image(image, width, join(folder, copy_name))
+                    remove_old_copies(folder, name, image_hash)
+                copy_srcset.append('{}/{} {}w'.format(responsive_folder, copy_name, width))
+    return srcset, webp_srcset
+
+# each image of the template with a class from responsive_images gets its srcset and sizes,
+# and is wrapped into a picture with the WebP copies
+def responsive_template(template, output_folder=''):
+    try:
+        import PIL
+    except ImportError:
+        print('WARNING: Pillow is not installed (pip install Pillow), so the images are not resized')
+        return template
+
+    def responsive_image(match):
+        tag = match.group(0)
+        image_class = re.search(r'class="([^"]*)"', tag)
+        src = re.search(r'src="([^"]*)"', tag)
+        if image_class is None or image_class.group(1) not in responsive_images or src is None or not exists(join(output_folder, src.group(1))):
+            return tag
+        widths, sizes = responsive_images[image_class.group(1)]
+        srcset, webp_srcset = image_srcsets(src.group(1), output_folder, widths)
+        image = '{} srcset="{}" sizes="{}">'.format(tag[:-1].rstrip('/ '), ', '.join(srcset), sizes)
+        return '<picture><source type="image/webp" srcset="{}" sizes="{}">{}</picture>'.format(', '.join(webp_srcset), sizes, image)
+
+    return re.sub(r'<img [^>]*>', responsive_image, template)
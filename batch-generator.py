@@ -0,0 +1,144 @@
+import sys
+import io
+import json
+import time
+import hashlib
+import traceback
+from os import cpu_count, devnull, makedirs
+from os.path import abspath, dirname, join, samefile
+from shutil import copy2, copytree
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from page import build_page
+from assets import sidebar_text_color, recolor_svg, icon_modes, social_icons
+
+# Generates the pages for many people at once. The profiles are listed in a JSON file like this:
+# [
+#     {"content": "people/alice/content.md", "bib": "people/alice/bibliography.bib", "output": "site/alice"},
+#     {"content": "people/bob/content.md", "dblp": "https://dblp.org/pid/160/0973.html", "output": "site/bob",
+#      "change_conference_names": true, "images": "people/bob/images", "decisions": "people/bob/arxiv-decisions.json"}
+# ]
+# The "bib" and "dblp" fields can also be lists, then all these bibliographies are merged,
+# and a paper found in several of them is taken from the first one in the order of the fields
+# (the same paper twice in one of them is kept, see publications.merge_bib_entries).
+# The template and the styles are shared by all pages and are read only once,
+# and the pages are generated in parallel by several processes
+
+def init_worker():
+    # nobody can answer the questions about arXiv papers in batch mode, so a profile with
+    # a new question fails (or defers it) instead of asking, and the input is closed just in case
+    sys.stdin = open(devnull, 'r')
+    # the slow imports are done once per process, not once per page
+    import markdown
+    import publications
+
+def build_profile(profile, template, color, offline, max_age, full_rebuild, icons, questions, lazy_publications, collapse_years, responsive_images, production):
+    log = io.StringIO()
+    start = time.perf_counter()
+    changed, error = False, None
+    try:
+        with redirect_stdout(log):
+            output_folder = profile['output']
+            makedirs(output_folder, exist_ok=True)
+            # the page needs the styles, fonts and images next to it
+            if not samefile(output_folder, dirname(abspath(__file__))):
+                copy2('styles.css', output_folder)
+                copytree('fonts', join(output_folder, 'fonts'), dirs_exist_ok=True)
+                copytree('images', join(output_folder, 'images'), dirs_exist_ok=True)
+                if 'images' in profile:
+                    copytree(profile['images'], join(output_folder, 'images'), dirs_exist_ok=True)
+            bib_sources = []
+            for field, value in profile.items():
+                if field in ('bib', 'dblp'):
+                    bib_sources += [(field, source) for source in ([value] if isinstance(value, str) else value)]
+            cache_folder = join('.cache', 'batch', hashlib.sha1(abspath(output_folder).encode()).hexdigest())
+            changed = build_page(profile['content'], template, join(output_folder, 'index.html'), profile.get('bib'), profile.get('dblp'),
+                                 profile.get('change_conference_names', False), color, offline, max_age, full_rebuild, cache_folder, icons,
+                                 profile.get('decisions'), questions, lazy_publications, collapse_years,
+                                 responsive_images=responsive_images, production=production, bib_sources=bib_sources)
+    except Exception as e:
+        from publications import UndecidedArxivPapers, BibliographyUnavailable
+        error = 'ERROR: {}\n'.format(e) if isinstance(e, (UndecidedArxivPapers, BibliographyUnavailable)) else traceback.format_exc()
+    return changed, time.perf_counter() - start, log.getvalue(), error
+
+
+if __name__ == '__main__':
+    template_file = 'template.html'
+    jobs = cpu_count()
+    offline = False
+    max_age = 3600
+    full_rebuild = False
+    icons = 'files'
+    questions = 'fail'
+    lazy_publications = False
+    collapse_years = None
+    responsive_images = False
+    production = False
+
+    args = sys.argv
+
+    if len(args) < 2 or '-h' in args or '--help' in args:
+        print("Usage: python batch-generator.py profiles.json [-j jobs] [--offline] [--max-age seconds=3600] [--rebuild] [--icons files|data-uri|sprite]")
+        print("                                         [--non-interactive fail|defer (fail by default)] [--lazy-bibtex] [--collapse-years years]")
+        print("                                         [--responsive-images] [--production]")
+        print("profiles.json is a list of profiles, each of them has 'content', 'output' and 'bib' and/or 'dblp' fields")
+        print("(a bib file or a DBLP link, or lists of them which are merged)")
+        print("and optional 'change_conference_names', 'images' and 'decisions' fields")
+        print("The other arguments mean the same as for html-generator.py")
+        exit(0)
+
+    for i in range(2, len(args)):
+        if args[i] == '-j':
+            jobs = int(args[i + 1])
+        elif args[i] == '--offline':
+            offline = True
+        elif args[i] == '--max-age':
+            max_age = int(args[i + 1])
+        elif args[i] == '--rebuild':
+            full_rebuild = True
+        elif args[i] == '--non-interactive':
+            questions = args[i + 1]
+            if questions not in ('fail', 'defer'):
+                print('ERROR: unknown --non-interactive option {}, it should be either fail or defer'.format(questions))
+                exit(1)
+        elif args[i] == '--lazy-bibtex':
+            lazy_publications = True
+        elif args[i] == '--collapse-years':
+            lazy_publications = True
+            collapse_years = int(args[i + 1])
+        elif args[i] == '--responsive-images':
+            responsive_images = True
+        elif args[i] == '--production':
+            production = True
+        elif args[i] == '--icons':
+            icons = args[i + 1]
+            if icons not in icon_modes:
+                print('ERROR: unknown --icons option {}, it should be one of: {}'.format(icons, ', '.join(icon_modes)))
+                exit(1)
+
+    with open(args[1], 'r') as f:
+        profiles = json.load(f)
+    with open(template_file, 'r') as f:
+        template = f.read()
+    color = sidebar_text_color('styles.css')
+    # the shared icons are recolored before the pages are generated,
+    # so that the processes do not write to the same files
+    if icons == 'files':
+        for icon in social_icons:
+            recolor_svg(icon, color)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker) as executor:
+        futures = [executor.submit(build_profile, profile, template, color, offline, max_age, full_rebuild, icons, questions,
+                                   lazy_publications, collapse_years, responsive_images, production) for profile in profiles]
+        results = [future.result() for future in futures]
+
+    failed = 0
+    for profile, (changed, elapsed, log, error) in zip(profiles, results):
+        status = 'FAILED' if error is not None else 'built' if changed else 'unchanged'
+        print('{:<40} {:<10} {:.2f}s'.format(profile['output'], status, elapsed))
+        if error is not None:
+            failed += 1
+            print(log + error)
+    print('{} pages in {:.2f}s, {} failed'.format(len(profiles), time.perf_counter() - start, failed))
+    exit(1 if failed > 0 else 0)
@@ -0,0 +1,70 @@
+# Check of the streaming bib reader (iter_bib_file) against bibtexparser.load, which reads
+# the whole file at once. Both must give the same entries (except the skipped types),
+# also for the text between the entries with stray @ (e.g., e-mail addresses in comments),
+# @comment, @preamble and @string blocks, the entries in parentheses and the entries
+# whose bracket is on the next line after the entry type.
+# Usage: python benchmarks/bib_streaming.py
+import sys
+import tempfile
+from os.path import abspath, dirname, join
+
+import bibtexparser
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from publications import iter_bib_file
+from synthetic import synthetic_bib
+
+tricky_bib = '''% Publications of Denis, contact denis@example.org for the missing ones
+% (the @ in the line above does not start an entry)
+
+@comment{This is a comment with {nested brackets} and another@address.org}
+
+@preamble{"\\newcommand{\\noop}[1]{}"}
+
+@string{gecco = "Genetic and Evolutionary Computation Conference"}
+
+@inproceedings{DBLP:conf/gecco/First,
+  author    = {Denis Antipov},
+  title     = {First Paper with an @ in the Title},
+  booktitle = gecco,
+  year      = {2020}
+}
+
+Some free text @ between the entries, write to me@example.org.
+
+@article(DBLP:journals/tcs/Second,
+  author  = {Denis Antipov and Benjamin Doerr},
+  title   = {Second {Paper}},
+  journal = {Theor. Comput. Sci.},
+  year    = {2021}
+)
+
+@article
+{DBLP:journals/tcs/Third,
+  author  = {Denis Antipov},
+  title   = {Third Paper with the Bracket on the Next Line},
+  journal = {Theor. Comput. Sci.},
+  year    = {2022}
+}
+
+@misc{skipped,
+  title = {A skipped entry},
+  year  = {2022}
+}
+'''
+
+def check(name, text):
+    with tempfile.TemporaryDirectory() as folder:
+        filename = join(folder, name + '.bib')
+        with open(filename, 'w') as f:
+            f.write(text)
+        with open(filename, 'r') as f:
+            expected = [entry for entry in bibtexparser.load(f).entries if entry['ENTRYTYPE'] not in ('phdthesis', 'misc')]
+        streamed = list(iter_bib_file(filename))
+    ok = streamed == expected
+    print('{:<12} {:>6} entries expected, {:>6} streamed: {}'.format(name, len(expected), len(streamed), 'ok' if ok else 'DIFFERENT'))
+    return ok
+
+results = [check('tricky', tricky_bib), check('synthetic', synthetic_bib(1000))]
+if not all(results):
+    exit(1)
@@ -0,0 +1,118 @@
+# Check of the DBLP bibliography cache (fetch_bib_dblp) against a local stand-in for DBLP,
+# which answers with an ETag and counts the requests: without a cache the page must be downloaded,
+# a fresh cache is used without any request, an old one is revalidated (304 Not Modified),
+# a changed bibliography is downloaded again (and parsed again, not taken from the old pickle),
+# the cache is used when the server is down and in offline mode, and several threads
+# fetching the same page do not break the cache files.
+# Usage: python benchmarks/dblp_cache.py
+import io
+import sys
+import hashlib
+import tempfile
+import threading
+from os import listdir
+from os.path import abspath, dirname
+from contextlib import redirect_stdout
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+import publications
+from publications import fetch_bib_dblp, fetch_bib_dblp_many, read_cached_bib, BibliographyUnavailable
+from synthetic import synthetic_bib
+
+# what the stand-in server sends, and what it got
+served = {'bib': synthetic_bib(50, seed=1).encode(), 'down': False}
+requests_log = []
+
+class DblpHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        etag = '"{}"'.format(hashlib.sha1(served['bib']).hexdigest())
+        if served['down']:
+            status = 503
+        elif self.headers.get('If-None-Match') == etag:
+            status = 304
+        else:
+            status = 200
+        requests_log.append(status)
+        self.send_response(status)
+        if status == 200:
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(served['bib'])))
+        else:
+            self.send_header('Content-Length', '0')
+        self.end_headers()
+        if status == 200:
+            self.wfile.write(served['bib'])
+
+    def log_message(self, format, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), DblpHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+link = 'http://127.0.0.1:{}/pid/00/0000.html'.format(server.server_address[1])
+
+results = []
+
+def check(name, condition):
+    results.append(condition)
+    print('{:<40} {}'.format(name, 'ok' if condition else 'FAILED'))
+
+# the filename is None if BibliographyUnavailable is raised
+def fetch(max_age=3600, offline=False):
+    requests_log.clear()
+    filename = None
+    with redirect_stdout(io.StringIO()) as output:
+        try:
+            filename = fetch_bib_dblp(link, max_age, offline)
+        except BibliographyUnavailable:
+            pass
+    return filename, list(requests_log), output.getvalue()
+
+def cached_bib(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+with tempfile.TemporaryDirectory() as folder:
+    publications.cache_dir = folder
+
+    filename, log, _ = fetch(offline=True)
+    check('offline without cache', filename is None and log == [])
+
+    served['down'] = True
+    filename, log, _ = fetch()
+    check('server down without cache', filename is None and log == [503])
+    served['down'] = False
+
+    filename, log, _ = fetch()
+    check('first download', log == [200] and cached_bib(filename) == served['bib'])
+    entries = len(read_cached_bib(filename).entries)
+
+    filename, log, _ = fetch()
+    check('fresh cache, no request', log == [] and cached_bib(filename) == served['bib'])
+
+    filename, log, _ = fetch(max_age=0)
+    check('old cache, revalidated (304)', log == [304] and cached_bib(filename) == served['bib'])
+
+    served['bib'] = synthetic_bib(60, seed=2).encode()
+    filename, log, _ = fetch(max_age=0)
+    check('changed bibliography downloaded again', log == [200] and cached_bib(filename) == served['bib'])
+    check('changed bibliography parsed again', len(read_cached_bib(filename).entries) != entries)
+
+    served['down'] = True
+    filename, log, output = fetch(max_age=0)
+    check('server down, stale cache used', log == [503] and cached_bib(filename) == served['bib'] and 'WARNING' in output)
+    served['down'] = False
+
+    filename, log, _ = fetch(max_age=0, offline=True)
+    check('offline with cache, no request', log == [] and cached_bib(filename) == served['bib'])
+
+    served['bib'] = synthetic_bib(70, seed=3).encode()
+    requests_log.clear()
+    with redirect_stdout(io.StringIO()):
+        filenames = fetch_bib_dblp_many([link] * 4, max_age=0)
+    check('same page fetched by several threads', len(set(filenames)) == 1 and cached_bib(filenames[0]) == served['bib']
+          and not any('.tmp' in name for name in listdir(folder)))
+
+server.shutdown()
+if not all(results):
+    exit(1)
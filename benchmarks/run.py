@@ -0,0 +1,150 @@
+# Benchmark of the whole generator on synthetic bibliographies and content files.
+# Every stage is timed separately: parsing the bib file, normalizing the entries,
+# matching the arXiv papers, converting LaTeX, rendering the publications HTML,
+# rendering the content file and writing the page from the template.
+# The results are written as JSON, and if the results of another version are given
+# with --compare, the times are compared with them.
+# Usage: python benchmarks/run.py [--sizes 100,1000,10000] [--corr-ratio 0.3] [--duplicate-ratio 0.05]
+#        [--latex-ratio 0.3] [--sections 20] [--repeat 3] [--output benchmark.json] [--compare old-benchmark.json]
+import io
+import sys
+import json
+import time
+import platform
+import tempfile
+from datetime import date, datetime
+from os.path import abspath, dirname, getsize, join
+from contextlib import redirect_stdout
+
+script_folder = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, script_folder)
+import publications
+from publications import iter_bib_file, normalize_entries, match_arxiv_papers, render_publications, latex_to_html
+from page import generate_content, split_template, write_page, file_hash, fragment_key
+from synthetic import synthetic_bib, synthetic_content
+
+stages = ['parse', 'normalize', 'arxiv match', 'latex', 'html', 'content', 'template']
+
+def clear_latex_cache():
+    latex_to_html.cache_clear()
+    publications.latex_cache = None
+
+# the best time of several runs, the result of the last run is returned as well
+def timed(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def run_stages(bib_filename, content_filename, template, output_filename, repeat):
+    times = dict()
+    times['parse'], entries = timed(repeat, lambda: list(iter_bib_file(bib_filename)))
+    # normalizing changes the entries, so every run gets its own copy, which is not timed
+    copies = [[dict(entry) for entry in entries] for _ in range(repeat)]
+    times['normalize'], normalized = timed(repeat, lambda: normalize_entries(copies.pop()))
+    # the matching sets the arXiv links, so it is run on the same entries every time,
+    # all titles are found, so nobody is asked anything
+    with redirect_stdout(io.StringIO()):
+        times['arxiv match'], shown = timed(repeat, match_arxiv_papers, normalized)
+
+    def convert_latex():
+        clear_latex_cache()
+        for publication in shown:
+            latex_to_html(publication.fields['title'])
+            if 'author' in publication.fields:
+                latex_to_html(publication.fields['author'])
+    times['latex'], _ = timed(repeat, convert_latex)
+    # the LaTeX conversions are memoized by now, so this is the rendering itself
+    times['html'], publications_html = timed(repeat, render_publications, shown)
+    times['content'], (name, menu, links, content) = timed(repeat, generate_content, content_filename, None)
+    today = date.today().strftime("%d %B %Y")
+    content.append(publications_html)
+
+    def fill_template():
+        with open(output_filename, 'w') as f:
+            write_page(f, split_template(template), (name, menu, links, today, content))
+    times['template'], _ = timed(repeat, fill_template)
+    return times, len(entries), len(shown)
+
+def compare(results, old_results):
+    old_times = {result['entries']: result['times'] for result in old_results['results']}
+    print()
+    print('Compared with {} ({}):'.format(old_results['version'], old_results['date']))
+    print('{:>8} '.format('entries') + ' '.join('{:>12}'.format(stage) for stage in stages))
+    for result in results:
+        if result['entries'] in old_times:
+            old = old_times[result['entries']]
+            print('{:>8} '.format(result['entries']) + ' '.join('{:>11.2f}x'.format(result['times'][stage] / old[stage]) if old.get(stage) else '{:>12}'.format('-') for stage in stages))
+
+
+if __name__ == '__main__':
+    sizes = [100, 1000, 10000]
+    corr_ratio = 0.3
+    duplicate_ratio = 0.05
+    latex_ratio = 0.3
+    sections = 20
+    repeat = 3
+    output_file = 'benchmark.json'
+    compare_file = None
+
+    args = sys.argv
+    if '-h' in args or '--help' in args:
+        print('Usage: python benchmarks/run.py [--sizes 100,1000,10000] [--corr-ratio 0.3] [--duplicate-ratio 0.05] [--latex-ratio 0.3]')
+        print('       [--sections 20] [--repeat 3] [--output benchmark.json] [--compare old-benchmark.json]')
+        exit(0)
+
+    for i in range(1, len(args)):
+        if args[i] == '--sizes':
+            sizes = [int(size) for size in args[i + 1].split(',')]
+        elif args[i] == '--corr-ratio':
+            corr_ratio = float(args[i + 1])
+        elif args[i] == '--duplicate-ratio':
+            duplicate_ratio = float(args[i + 1])
+        elif args[i] == '--latex-ratio':
+            latex_ratio = float(args[i + 1])
+        elif args[i] == '--sections':
+            sections = int(args[i + 1])
+        elif args[i] == '--repeat':
+            repeat = int(args[i + 1])
+        elif args[i] == '--output':
+            output_file = args[i + 1]
+        elif args[i] == '--compare':
+            compare_file = args[i + 1]
+
+    with open(join(script_folder, 'template.html'), 'r') as f:
+        template = f.read()
+
+    results = []
+    print('{:>8} '.format('entries') + ' '.join('{:>12}'.format(stage) for stage in stages))
+    with tempfile.TemporaryDirectory() as folder:
+        content_filename = join(folder, 'content.md')
+        with open(content_filename, 'w') as f:
+            f.write(synthetic_content(sections))
+        content_size = getsize(content_filename)
+        for n in sizes:
+            bib_filename = join(folder, 'bibliography-{}.bib'.format(n))
+            with open(bib_filename, 'w') as f:
+                f.write(synthetic_bib(n, corr_ratio, duplicate_ratio, latex_ratio))
+            times, entries, shown = run_stages(bib_filename, content_filename, template, join(folder, 'index.html'), repeat)
+            results.append({'entries': n, 'bib entries': entries, 'shown': shown, 'bib size': getsize(bib_filename), 'times': times})
+            print('{:>8} '.format(n) + ' '.join('{:>11.3f}s'.format(times[stage]) for stage in stages))
+
+    # the version of the generator is the hash of its code, like in the incremental builds
+    benchmark = {
+        'version': fragment_key(file_hash(join(script_folder, 'page.py')), file_hash(join(script_folder, 'publications.py')))[:10],
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'parameters': {'corr ratio': corr_ratio, 'duplicate ratio': duplicate_ratio, 'latex ratio': latex_ratio,
+                       'sections': sections, 'content size': content_size, 'repeat': repeat},
+        'results': results,
+    }
+    with open(output_file, 'w') as f:
+        json.dump(benchmark, f, indent=4)
+    print('Results are written to {}'.format(output_file))
+
+    if compare_file is not None:
+        with open(compare_file, 'r') as f:
+            compare(results, json.load(f))
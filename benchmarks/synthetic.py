@@ -0,0 +1,130 @@
+# Generators of synthetic inputs for the benchmarks: DBLP-style bibliographies and content files
+import random
+
+common_words = 'of the for a on with and in to via'.split()
+topic_words = ('evolutionary algorithm runtime analysis offspring population size threshold efficiency '
+               'crossover mutation fitness landscape plateau jump function heavy tailed parameter control '
+               'self adjusting lower upper bound drift theorem multi objective optimization').split()
+syllables = 'ro ta mi ne lu ka so vi de pa gro tri sta ple con mat ex op ti mal'.split()
+latex_pieces = ['{$(1+(\\lambda, \\lambda))$}', '{(\\(\\mu\\)}, {\\(\\lambda\\)}) {EA}', '{\\(\\mathcal{O}(n \\log n)\\)}',
+                '\\emph{OneMax}', '{NP}-hard', '{LeadingOnes}', '{$\\varepsilon$}-approximation']
+first_names = ['Denis', 'Benjamin', 'Vitalii', 'Maxim', 'Quentin', 'Carola', 'Frank', 'Aneta', 'Fran{\\c{c}}ois', 'J{\\"{u}}rgen', 'Ren{\\\'{e}}']
+last_names = ['Antipov', 'Doerr', 'Karavaev', 'Buzdalov', 'Renau', 'Neumann', 'Witt', 'Sudholt', 'K{\\"{o}}tzing', 'Lehre', 'Oliveto', 'Krejca']
+venues = [('conf', 'gecco', 'Proceedings of the Genetic and Evolutionary Computation Conference, {GECCO} {year}, Lille, France', 'inproceedings'),
+          ('conf', 'ppsn', 'Parallel Problem Solving from Nature, {{PPSN}} {year}, Part I', 'inproceedings'),
+          ('conf', 'foga', 'Foundations of Genetic Algorithms, {{FOGA}} {year}', 'inproceedings'),
+          ('journals', 'tcs', 'Theor. Comput. Sci.', 'article'),
+          ('journals', 'algorithmica', 'Algorithmica', 'article'),
+          ('journals', 'telo', '{ACM} Trans. Evol. Learn. Optim.', 'article')]
+
+def synthetic_titles(n, corr_ratio=0.3, seed=0):
+    random.seed(seed)
+    # real titles mix a few very common words with a long tail of rarer ones
+    vocabulary = topic_words + [''.join(random.choice(syllables) for _ in range(random.randint(2, 4))) for _ in range(3000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    venue_titles = []
+    for _ in range(n):
+        title = random.choices(vocabulary, weights, k=random.randint(4, 10))
+        for _ in range(random.randint(1, 3)):
+            title.insert(random.randrange(len(title)), random.choice(common_words))
+        venue_titles.append(' '.join(title))
+    corr_titles = []
+    for title in random.sample(venue_titles, int(n * corr_ratio)):
+        # arXiv versions often differ by a few characters (casing, braces, plural forms)
+        title = list(title)
+        for _ in range(random.randint(0, 6)):
+            title[random.randrange(len(title))] = random.choice('abcdefghijklmnopqrstuvwxyz{} ')
+        corr_titles.append(''.join(title))
+    return venue_titles, corr_titles
+
+def bib_field_lines(fields):
+    width = max(len(name) for name, _ in fields)
+    return ',\n'.join('  {} = {{{}}}'.format(name.ljust(width), value) for name, value in fields)
+
+# a, b, ..., z, ba, bb, ... like DBLP does for the same authors and year,
+# but for every paper, so that the IDs are duplicated only on purpose
+def id_suffix(i):
+    suffix = chr(ord('a') + i % 26)
+    while i >= 26:
+        i //= 26
+        suffix = chr(ord('a') + i % 26) + suffix
+    return suffix
+
+# A bibliography of n conference and journal papers in the DBLP format.
+# corr_ratio of them also have an arXiv version with a slightly different title,
+# duplicate_ratio of them have the same short ID as another paper (but another venue),
+# and latex_ratio of the titles contain LaTeX formulas and commands
+def synthetic_bib(n, corr_ratio=0.3, duplicate_ratio=0.05, latex_ratio=0.3, seed=0):
+    venue_titles, _ = synthetic_titles(n, 0, seed)
+    random.seed(seed)
+    entries = []
+    # the short IDs with the numbers of the venues where they are used
+    short_ids = []
+    for i, title in enumerate(venue_titles):
+        title = title.capitalize()
+        if random.random() < latex_ratio:
+            title = title.replace(' ', ' {} '.format(random.choice(latex_pieces)), 1)
+        authors = random.sample(range(len(last_names)), random.randint(1, 4))
+        author = ' and\n                  '.join('{} {}'.format(random.choice(first_names), last_names[a]) for a in authors)
+        year = random.randint(2010, 2024)
+        venue_number = random.randrange(len(venues))
+        free_venues = []
+        if short_ids and random.random() < duplicate_ratio:
+            # DBLP keys are unique, so the same short ID comes with a venue where it is not used yet
+            short_id, used_venues = random.choice(short_ids)
+            free_venues = [number for number in range(len(venues)) if number not in used_venues]
+        if free_venues:
+            venue_number = random.choice(free_venues)
+            used_venues.add(venue_number)
+        else:
+            short_id = '{}{}{}{}'.format(last_names[authors[0]].replace('{', '').replace('}', '').replace('\\"', ''),
+                                       ''.join(last_names[a][0] for a in authors[1:]), year % 100, id_suffix(i))
+            short_ids.append((short_id, {venue_number}))
+        kind, venue, venue_name, entry_type = venues[venue_number]
+        fields = [('author', author), ('title', title)]
+        if entry_type == 'inproceedings':
+            fields += [('booktitle', venue_name.replace('{year}', str(year))), ('pages', '{}--{}'.format(i, i + 8)), ('publisher', '{ACM}')]
+        else:
+            fields += [('journal', venue_name), ('volume', str(100 + i % 900)), ('pages', '{}--{}'.format(i, i + 20))]
+        fields += [('year', str(year)), ('url', 'https://doi.org/10.1145/{}.{}'.format(year, i)), ('doi', '10.1145/{}.{}'.format(year, i)),
+                   ('timestamp', 'Mon, 01 Jan 2024 12:00:00 +0100'), ('biburl', 'https://dblp.org/rec/{}/{}/{}.bib'.format(kind, venue, short_id)),
+                   ('bibsource', 'dblp computer science bibliography, https://dblp.org')]
+        entries.append('@{}{{DBLP:{}/{}/{},\n{}\n}}\n'.format(entry_type, kind, venue, short_id, bib_field_lines(fields)))
+
+        if random.random() < corr_ratio:
+            # at most three changed characters, so that the generator always finds the match
+            corr_title = list(title)
+            for _ in range(random.randint(0, 3)):
+                position = random.randrange(len(corr_title))
+                if corr_title[position].isalpha():
+                    corr_title[position] = corr_title[position].swapcase()
+            arxiv_id = '{}.{:05d}'.format(year % 100 * 100 + random.randint(1, 12), i)
+            fields = [('author', author), ('title', ''.join(corr_title)), ('journal', 'CoRR'), ('volume', 'abs/' + arxiv_id),
+                      ('year', str(year)), ('eprinttype', 'arXiv'), ('eprint', arxiv_id), ('url', 'https://arxiv.org/abs/' + arxiv_id),
+                      ('timestamp', 'Mon, 01 Jan 2024 12:00:00 +0100'), ('biburl', 'https://dblp.org/rec/journals/corr/abs-{}.bib'.format(arxiv_id))]
+            entries.append('@article{{DBLP:journals/corr/abs-{},\n{}\n}}\n'.format(arxiv_id.replace('.', '-'), bib_field_lines(fields)))
+    random.shuffle(entries)
+    return '\n'.join(entries)
+
+# A content file with the given number of sections, each of them
+# has paragraphs, a list and a list with specified items
+def synthetic_content(sections=5, paragraphs=3, list_length=5, seed=0):
+    random.seed(seed)
+    vocabulary = topic_words + common_words * 3
+
+    def sentence(words=12):
+        return ' '.join(random.choice(vocabulary) for _ in range(words)).capitalize() + '.'
+
+    lines = ['Friend the Dog', '',
+             'https://dblp.org/pid/160/0973.html',
+             'https://scholar.google.com/citations?hl=en&user=X3G0oowAAAAJ',
+             'https://orcid.org/0000-0001-7906-096X',
+             'https://twitter.com/someone/', '']
+    for section in range(sections):
+        lines += ['# Section number {} # Section {}'.format(section, section), '']
+        for _ in range(paragraphs):
+            lines += [' '.join(sentence() for _ in range(4)) + ' See [this link](https://example.com/{}).'.format(section), '']
+        lines += ['- {} **{}**'.format(sentence(6), random.choice(topic_words)) for _ in range(list_length)] + ['']
+        lines += ['* {}-{}: {}'.format(2000 + i, 2001 + i, sentence(8)) for i in range(list_length)] + ['']
+    lines += ['# Publications', '']
+    return '\n'.join(lines) + '\n'
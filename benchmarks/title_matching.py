@@ -0,0 +1,35 @@
+# Benchmark of the arXiv-to-venue title matching used in gen_html_by_database.
+# Compares the indexed matching with the full pairwise scan on synthetic titles.
+# Usage: python benchmarks/title_matching.py [max-size-for-full-scan=5000]
+import sys
+import time
+from os.path import abspath, dirname
+
+import Levenshtein
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+from publications import build_title_index, find_similar_titles
+from synthetic import synthetic_titles
+
+def indexed_matching(venue_titles, corr_titles):
+    title_index = build_title_index(venue_titles)
+    return [find_similar_titles(title_index, title) for title in corr_titles]
+
+def full_scan(venue_titles, corr_titles):
+    return [[i for i, other in enumerate(venue_titles) if Levenshtein.distance(title, other) < 10] for title in corr_titles]
+
+max_full_scan = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+print('{:>8} {:>12} {:>12} {:>10}'.format('entries', 'indexed, s', 'full scan, s', 'speedup'))
+for n in (100, 500, 1000, 5000, 10000, 50000):
+    venue_titles, corr_titles = synthetic_titles(n)
+    start = time.perf_counter()
+    matches = indexed_matching(venue_titles, corr_titles)
+    indexed_time = time.perf_counter() - start
+    if n <= max_full_scan:
+        start = time.perf_counter()
+        assert matches == full_scan(venue_titles, corr_titles)
+        full_time = time.perf_counter() - start
+        print('{:>8} {:>12.3f} {:>12.3f} {:>9.1f}x'.format(n, indexed_time, full_time, full_time / indexed_time))
+    else:
+        print('{:>8} {:>12.3f} {:>12} {:>10}'.format(n, indexed_time, '-', '-'))
@@ -0,0 +1,201 @@
+import re
+import json
+from profiling import stage, count
+from files import write_file
+
+# The content file is compiled into a document: the name, the social links and the sections,
+# which consist of paragraphs, bullet lists ("- ...") and list items ("* item: description").
+# The compiled document is kept in the cache folder together with the hash of the content file
+# and the HTML of its paragraphs and lists, so that an unchanged content file is not parsed again
+# and after a change only the changed paragraphs and lists are rendered by markdown.
+
+class Paragraph:
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+    def markdown_source(self):
+        return self.text
+
+    def to_json(self):
+        return ['paragraph', self.text]
+
+class BulletList:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def markdown_source(self):
+        return '- ' + '\n- '.join(self.items)
+
+    def to_json(self):
+        return ['list', self.items]
+
+class ListItem:
+    __slots__ = ('item', 'description')
+
+    def __init__(self, item, description):
+        self.item = item
+        self.description = description
+
+    def markdown_source(self):
+        return self.description
+
+    def to_json(self):
+        return ['list-item', self.item, self.description]
+
+block_types = {'paragraph': Paragraph, 'list': BulletList, 'list-item': ListItem}
+
+class Section:
+    __slots__ = ('header', 'blocks')
+
+    def __init__(self, header, blocks):
+        self.header = header
+        self.blocks = blocks
+
+    # the header can be "Title # Menu item", if the menu needs a shorter name
+    def title(self):
+        return self.header.split('#')[0].strip()
+
+    def menu_item(self):
+        return self.header.split('#')[-1].strip()
+
+    def id(self):
+        return re.sub(r'\s+', '-', self.menu_item().lower())
+
+    def to_json(self):
+        return [self.header, [block.to_json() for block in self.blocks]]
+
+    @staticmethod
+    def from_json(data):
+        return Section(data[0], [block_types[block[0]](*block[1:]) for block in data[1]])
+
+# the first lines of the file (before the first section) are the name and the social links
+class Document:
+    __slots__ = ('name', 'links', 'sections')
+
+    def __init__(self, name, links, sections):
+        self.name = name
+        self.links = links
+        self.sections = sections
+
+    def markdown_sources(self):
+        return set(block.markdown_source() for section in self.sections for block in section.blocks)
+
+    def to_json(self):
+        return {'name': self.name, 'links': self.links, 'sections': [section.to_json() for section in self.sections]}
+
+    @staticmethod
+    def from_json(data):
+        return Document(data['name'], data['links'], [Section.from_json(section) for section in data['sections']])
+
+def parse_content(lines):
+    sections = [Section('', [])]
+    for line in lines:
+        blocks = sections[-1].blocks
+        if line[0] == '#':
+            sections.append(Section(line[1:].strip(), []))
+        elif line[0] == '-':
+            if len(blocks) == 0 or not isinstance(blocks[-1], BulletList):
+                blocks.append(BulletList([]))
+            blocks[-1].items.append(line[1:].strip())
+        elif line[0] == '*':
+            item, description = line[1:].strip().split(':', 1)
+            blocks.append(ListItem(item, description))
+        elif len(line.strip()) > 0:
+            blocks.append(Paragraph(line.strip()))
+    header = sections[0].blocks
+    return Document(header[0].text, [block.text for block in header[1:]], sections[1:])
+
+
+# cache filename -> {'version': see load_content_cache, 'hash': hash of the content file,
+# 'document': the compiled document, 'renders': markdown source -> HTML,
+# 'saved renders': the number of renders in the file, 'changed': whether the document changed since it was saved}
+content_caches = dict()
+
+# the rendered HTML depends on the version of markdown and on the generator itself
+# (e.g., on markdown_to_html), so the cache made by another version of them is not used
+def load_content_cache(cache_filename, generator=None):
+    from markdown import __version__ as markdown_version
+    version = [markdown_version, generator]
+    if cache_filename not in content_caches or content_caches[cache_filename]['version'] != version:
+        cache = {'version': version, 'hash': None, 'document': None, 'renders': dict(), 'saved renders': 0, 'changed': False}
+        try:
+            with open(cache_filename, 'r') as f:
+                data = json.load(f)
+                count('bytes read', f.tell())
+            if data['version'] == version:
+                cache.update({'hash': data['hash'], 'document': Document.from_json(data['document']),
+                              'renders': data['renders'], 'saved renders': len(data['renders'])})
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        content_caches[cache_filename] = cache
+    return content_caches[cache_filename]
+
+# Returns the compiled document and the rendered HTML of its paragraphs and lists.
+# Without cache_filename the file is compiled and rendered from scratch. generator is
+# the hash of the generator's code, the cache of another generator is not used.
+def compile_content(content_filename, content_hash=None, cache_filename=None, generator=None):
+    cache = load_content_cache(cache_filename, generator) if cache_filename is not None else None
+    if cache is not None and cache['document'] is not None and cache['hash'] == content_hash:
+        return cache['document'], cache['renders']
+    with stage('content parsing'):
+        with open(content_filename, 'r') as f:
+            lines = f.readlines()
+            count('bytes read', f.tell())
+        document = parse_content(lines)
+    if cache is None:
+        return document, dict()
+    cache.update({'hash': content_hash, 'document': document, 'changed': True})
+    return document, cache['renders']
+
+# the file is saved if the document changed or new paragraphs were rendered,
+# only the HTML of the current paragraphs and lists is kept, and since several
+# generators can work at the same time, the file is replaced at once
+def save_content_cache(cache_filename):
+    cache = content_caches.get(cache_filename)
+    if cache is None or cache['document'] is None or (not cache['changed'] and len(cache['renders']) == cache['saved renders']):
+        return
+    sources = cache['document'].markdown_sources()
+    cache['renders'] = {source: html for source, html in cache['renders'].items() if source in sources}
+    write_file(cache_filename, json.dumps({'version': cache['version'], 'hash': cache['hash'], 'document': cache['document'].to_json(), 
+                                           'renders': cache['renders']}).encode())
+    cache['changed'] = False
+    cache['saved renders'] = len(cache['renders'])
+
+
+# creating a Markdown instance (with all its processors) costs more than converting
+# a paragraph, so one instance is reset and reused for all conversions
+markdown_converter = None
+
+def markdown_to_html(source):
+    global markdown_converter
+    count('markdown renders')
+    with stage('markdown rendering'):
+        if markdown_converter is None:
+            import markdown
+            markdown_converter = markdown.Markdown()
+        html = markdown_converter.reset().convert(source)
+        return re.sub(r'<a ([^>]*)>', r'<a \1 target="_blank">', html).encode('ascii', 'xmlcharrefreplace').decode()
+
+def cached_markdown(source, renders):
+    if source not in renders:
+        renders[source] = markdown_to_html(source)
+    return renders[source]
+
+def render_block(block, renders, indent=16):
+    html = cached_markdown(block.markdown_source(), renders)
+    if isinstance(block, Paragraph):
+        return '{}{}\n'.format(' ' * indent, html)
+    elif isinstance(block, BulletList):
+        return '{}{}\n'.format(' ' * indent, html.replace('<li>', ' ' * (indent + 4) + '<li>').replace('</ul>', ' ' * indent + '</ul>'))
+    else:
+        return '{}{}\n'.format(' ' * indent, """<div class="list-row">
+                    <div class="list-item">{}:</div>
+                    <div class="list-description">{}</div>
+                </div>""".format(re.sub(r'-+', '&mdash;', block.item), html[3:-4]))
+
+def render_section(section, renders):
+    return ''.join(render_block(block, renders) for block in section.blocks)
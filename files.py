@@ -0,0 +1,15 @@
+import threading
+from os import makedirs, replace, getpid
+from os.path import dirname
+from profiling import count
+
+# Several generators (and several threads, see publications.fetch_bib_dblp_many) can write
+# the same cache files and pages, so a file is written next to it and replaces it at once,
+# and nobody reads a half-written file. data are bytes.
+def write_file(filename, data):
+    makedirs(dirname(filename) or '.', exist_ok=True)
+    temporary = filename + '.tmp{}-{}'.format(getpid(), threading.get_ident())
+    with open(temporary, 'wb') as f:
+        f.write(data)
+        count('bytes written', len(data))
+    replace(temporary, filename)
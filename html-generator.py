@@ -1,151 +1,119 @@
-import markdown
-import re
-from publications import read_bib_file, read_bib_dblp, gen_html_by_database
-from datetime import date
 import sys
-from os.path import exists
-
-def generate_content(content_filename, bib_database, change_conference_names = False):
-    with open(content_filename, 'r') as f:
-        lines = f.readlines()
-
-    sections = [('', [])]
-
-    for line in lines:
-        if line[0] == '#':
-            section_name = line[1:].strip()
-            sections.append((section_name, []))
-        elif line[0] == '-':
-            if len(sections[-1][1]) == 0 or sections[-1][1][-1][0] != 'list':
-                sections[-1][1].append(('list', []))
-            sections[-1][1][-1][1].append(line[1:].strip())
-        elif line[0] == '*':
-            item, description = line[1:].strip().split(':', 1)
-            sections[-1][1].append(('list-item', item, description))
-        elif len(line.strip()) > 0:
-            sections[-1][1].append(('paragraph', line.strip()))
-
-    def format_string_as_html(s):
-        return re.sub(r'<a ([^>]*)>', r'<a \1 target="_blank">', markdown.markdown(s)).encode('ascii', 'xmlcharrefreplace').decode()
-
-    def print_html(section_part, indent=16):
-        if section_part[0] == 'paragraph':
-            return '{}{}\n'.format(' ' * indent, format_string_as_html(section_part[1]))
-        elif section_part[0] == 'list':
-            return '{}{}\n'.format(' ' * indent, format_string_as_html('- ' + '\n- '.join(section_part[1])).replace('<li>', ' ' * (indent + 4) + '<li>').replace('</ul>', ' ' * indent + '</ul>'))
-        elif section_part[0] == 'list-item':
-            return '{}{}\n'.format(' ' * indent, """<div class="list-row">
-                    <div class="list-item">{}:</div>
-                    <div class="list-description">{}</div>
-                </div>""".format(re.sub(r'-+', '&mdash;', section_part[1]), format_string_as_html(section_part[2])[3:-4]))
-
-    name = sections[0][1][0][1]
-    links = [s[1] for s in sections[0][1][1:]]
-
-    def links_bar(links):
-        # get the sidebar text color:
-        color = None
-        with open('styles.css', 'r') as f:
-            sidebar_rules = re.sub(r'[^\{]*\{([^\}]*)\}',  r'\1', re.search(r'\.sidebar-text a, \.up-button\{[^\}]*\}', f.read()).group(0)).strip()
-        for line in sidebar_rules.split(';'):
-            if line.split(':')[0].strip() == 'color':
-                color = line.split(':')[1].strip()
-        
-        def recolor_svg(filename, color):
-            if color is not None:
-                with open(filename, 'r') as f:
-                    content = f.read()
-                with open(filename, 'w') as f:
-                    f.write(re.sub(r'fill:[^;]*', 'fill:{}'.format(color), content))
-
-        s = ''
-        for link in links:
-            s == ' ' * 12
-            if 'dblp.org' in link:
-                recolor_svg("images/dblp.svg", color)
-                s += '<a href="{}" class="social-link" target="_blank"><img src="images/dblp.svg" height="20"></a>\n'.format(link)
-            elif 'scholar.google.com' in link:
-                recolor_svg("images/google-scholar.svg", color)
-                s += '<a href="{}" class="social-link" target="_blank"><img src="images/google-scholar.svg" height="20"></a>\n'.format(link)
-            elif 'instagram.com' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-instagram"></i></a>\n'.format(link)
-            elif 'twitter.com' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-twitter"></i></a>\n'.format(link)
-            elif 't.me' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-telegram"></i></a>\n'.format(link)
-            elif 'scopus.com' in link:
-                recolor_svg("images/scopus.svg", color)
-                s += '<a href="{}" class="social-link" target="_blank"><img src="images/scopus.svg" height="20"></a>\n'.format(link)
-            elif 'researchgate.net' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-researchgate"></i></a>\n'.format(link)
-            elif 'facebook.com' in link or 'fb.com' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-facebook"></i></a>\n'.format(link)
-            elif 'orcid.org' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-orcid"></i></a>\n'.format(link)
-            elif 'linkedin.com' in link:
-                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-linkedin"></i></a>\n'.format(link)
-            else:
-                print('WARNING: unsupported social link: {}'.format(link))
-        return s
-    
-    def section_title(section_str):
-        if '#' in section_str:
-            return section_str.split('#')[0].strip()
-        else:
-            return section_str.strip()
-        
-    def section_menu_item(section_str):
-        if '#' in section_str:
-            return section_str.split('#')[-1].strip()
-        else:
-            return section_str.strip()
-
-    def id(section_str):
-        return re.sub(r'\s+', '-', section_menu_item(section_str).lower())
-
-    menu = ('\n' + ' ' * 12).join(['<li class="navi-item"><a href="#{}" onclick="close_sidebar()">{}</a></li>'.format(id(section[0]), section_menu_item(section[0])) for section in sections[1:]])
-    
-    # content = ('\n' + ' ' * 12).join([section)
-    content = ''
-
-    for section in sections[1:]:
-        content += ' ' * 12 + '<div id = "{}">\n'.format(id(section[0]))
-        content += ' ' * 16 + '<h1>{}</h1>\n'.format(section_title(section[0]))
-        if section[0] == 'Publications' and bib_database is not None: 
-            content += gen_html_by_database(bib_database, change_conference_names)
-        for section_part in section[1]:
-            content += print_html(section_part)
-        content += ' ' * 12 + '</div>\n\n'
-
-    return name, menu, links_bar(links), content
-
-
+import time
+import traceback
+from os.path import exists, dirname
+from page import build_page
+from assets import sidebar_text_color, icon_modes, social_icons
+import profiling
 
 # Main body of the script
 input_content_file = 'content.md'
-input_bib_file = None
-input_bib_link = None
+# ('bib', filename) and ('dblp', link) in the order of the arguments
+bib_sources = []
 template_file = 'template.html'
 output_file = 'index.html'
 change_conference_names = False
+offline = False
+max_age = 3600
+full_rebuild = False
+icons = 'files'
+decisions_file = None
+questions = 'ask'
+lazy_publications = False
+collapse_years = None
+responsive_images = False
+production = False
+watch_mode = False
+serve_port = None
+profile = False
+profile_json_file = None
+profile_dump_file = None
 
 args = sys.argv
 
 if '-h' in args or '--help' in args:
     # print("Usage: python html-generator.py [-il link-to-dblp | -if input-bib-file=bibliography.bib] [-t template-file=template.html] [-o output-file=index.html]")
-    print("Usage: python html-generator.py [-il link-to-dblp | -if input-bib-file=bibliography.bib]")
-    print("If both -il and -if arguments are present, -if is used")
+    print("Usage: python html-generator.py [-il link-to-dblp]... [-if input-bib-file=bibliography.bib]...")
+    print("                                [--offline] [--max-age seconds=3600] [--rebuild] [--icons files|data-uri|sprite]")
+    print("                                [--decisions file=arxiv-decisions.json] [--non-interactive fail|defer]")
+    print("                                [--lazy-bibtex] [--collapse-years years] [--responsive-images] [--production]")
+    print("                                [--watch] [--serve] [--port port=8000]")
+    print("                                [--profile] [--profile-json file] [--profile-dump file]")
+    print("There can be several -il and -if arguments (e.g., for a group page or for the papers that are not at DBLP yet),")
+    print("then all these bibliographies are merged, and the papers found in several of them are shown once, as they are")
+    print("in the first of them in the order of the arguments (the same paper twice in one bibliography is kept as it is).")
+    print("The DBLP pages are downloaded at the same time")
+    print("The DBLP bibliography is cached in the .cache folder and downloaded again only if it is older than --max-age seconds and has changed")
+    print("With --offline the cached DBLP bibliography is used without any downloading")
+    print("Only the parts of the page whose inputs changed since the last build are regenerated, use --rebuild to regenerate everything")
+    print("The answers to the questions about arXiv papers are saved to the --decisions file and are not asked again")
+    print("With --non-interactive fail the generator stops instead of asking a question, and with --non-interactive defer")
+    print("it shows such arXiv papers as they are until you answer the question in a later build or in the decisions file")
+    print("With --lazy-bibtex the bibtex items are written to the bibtex folder and loaded only when they are opened,")
+    print("and with --collapse-years N only the last N years of publications are shown, the older ones are loaded when they are opened")
+    print("(the page with these options should be opened through a web server, not as a file)")
+    print("With --watch the generator keeps working and rebuilds the page whenever the content, the bibliography,")
+    print("the template or the styles change, and with --serve it also shows the page at http://localhost:8000/")
+    print("(or another --port) and reloads it in the browser after each rebuild")
+    print("With --responsive-images the logo and the photos get resized and WebP copies in images/responsive,")
+    print("and the browser downloads the smallest one which is sharp enough (this needs Pillow)")
+    print("With --production the page and the styles are minified, the styles are written to styles.<hash>.css,")
+    print("and all of them get compressed .gz and .br copies for the web server (.br needs brotli)")
+    print("With --icons data-uri or --icons sprite the social icons are embedded into the page instead of being separate files")
+    print("With --profile the time of each stage of the build and the numbers of the slow operations are printed,")
+    print("--profile-json writes them to a JSON file, and --profile-dump writes the cProfile profile of the slowest stage to a file")
+    print("(add --rebuild to profile the whole build, otherwise only the changed parts of the page are generated)")
     print("The order of arguments is not important")
     print("The DBLP link should be to the author's page, not his bibliography page, e.g., 'https://dblp.org/pid/160/0973.html'")
     exit(0)
 
 for i in range(1, len(args)):
     if args[i] == '-il':
-        input_bib_link = args[i + 1]
+        bib_sources.append(('dblp', args[i + 1]))
     elif args[i] == '-if':
-        input_bib_file = args[i + 1]
+        bib_sources.append(('bib', args[i + 1]))
     elif args[i] == '-c':
         change_conference_names = True
+    elif args[i] == '--offline':
+        offline = True
+    elif args[i] == '--max-age':
+        max_age = int(args[i + 1])
+    elif args[i] == '--rebuild':
+        full_rebuild = True
+    elif args[i] == '--icons':
+        icons = args[i + 1]
+        if icons not in icon_modes:
+            print('ERROR: unknown --icons option {}, it should be one of: {}'.format(icons, ', '.join(icon_modes)))
+            exit(1)
+    elif args[i] == '--decisions':
+        decisions_file = args[i + 1]
+    elif args[i] == '--non-interactive':
+        questions = args[i + 1]
+        if questions not in ('fail', 'defer'):
+            print('ERROR: unknown --non-interactive option {}, it should be either fail or defer'.format(questions))
+            exit(1)
+    elif args[i] == '--lazy-bibtex':
+        lazy_publications = True
+    elif args[i] == '--collapse-years':
+        lazy_publications = True
+        collapse_years = int(args[i + 1])
+    elif args[i] == '--responsive-images':
+        responsive_images = True
+    elif args[i] == '--production':
+        production = True
+    elif args[i] == '--watch':
+        watch_mode = True
+    elif args[i] == '--serve':
+        watch_mode = True
+        serve_port = serve_port or 8000
+    elif args[i] == '--port':
+        serve_port = int(args[i + 1])
+    elif args[i] == '--profile':
+        profile = True
+    elif args[i] == '--profile-json':
+        profile_json_file = args[i + 1]
+    elif args[i] == '--profile-dump':
+        profile_dump_file = args[i + 1]
     # elif args[i] == '-ic':
     #     input_content_file = args[i + 1]
     # elif args[i] == '-t':
@@ -153,22 +121,65 @@ for i in range(1, len(args)):
     # elif args[i] == '-o':
     #     output_file = args[i + 1]
 
-bib_database = None
-
-if input_bib_file is None and input_bib_link is not None:
-    print('Downloading bibliography...')
-    bib_database = read_bib_dblp(input_bib_link)
-else:
-    if input_bib_file is None and exists('bibliography.bib'):
-        input_bib_file = 'bibliography.bib'
-    if input_bib_file is not None:
-        bib_database = read_bib_file(input_bib_file)
-
-
-
-name, menu, links, content = generate_content(input_content_file, bib_database, change_conference_names)
-
-with open(template_file, 'r') as f:
-    template = f.read()
-with open(output_file, 'w') as f:
-    f.write(template.format(name, menu, links, date.today().strftime("%d %B %Y"), content))
\ No newline at end of file
+if profile or profile_json_file is not None or profile_dump_file is not None:
+    profiling.enable(profile_dump_file is not None)
+
+if not bib_sources and exists('bibliography.bib'):
+    bib_sources.append(('bib', 'bibliography.bib'))
+# in the watch mode the template, the fragments of the page and the bibliography are kept in memory
+# in the watch mode the template and the fragments of the page are kept in memory
+template = None
+state = dict() if watch_mode else None
+
+def build(full_rebuild, read_template=True):
+    global template
+    if read_template:
+        with open(template_file, 'r') as f:
+            template = f.read()
+    try:
+        build_page(input_content_file, template, output_file, None, None, change_conference_names,
+                   sidebar_text_color('styles.css'), offline, max_age, full_rebuild, icons=icons,
+                   decisions_filename=decisions_file, questions=questions, lazy_publications=lazy_publications, collapse_years=collapse_years,
+                   state=state, responsive_images=responsive_images, production=production,
+                   bib_sources=bib_sources)
+    except Exception as e:
+        # publications is imported only when the bibliography is processed
+        from publications import UndecidedArxivPapers, BibliographyUnavailable
+        if not isinstance(e, (UndecidedArxivPapers, BibliographyUnavailable)):
+            raise
+        print('ERROR: {}'.format(e))
+        return False
+    return True
+
+with profiling.stage('build'):
+    if not build(full_rebuild) and not watch_mode:
+        exit(1)
+
+if profile:
+    profiling.print_report()
+if profile_json_file is not None:
+    profiling.save_report(profile_json_file)
+if profile_dump_file is not None:
+    hottest_stage = profiling.dump_hottest_stage(profile_dump_file)
+    print('The profile of the slowest stage ({}) is written to {}'.format(hottest_stage, profile_dump_file))
+
+
+if watch_mode:
+    import watch
+    if serve_port is not None:
+        watch.serve(dirname(output_file) or '.', serve_port)
+
+    def rebuild(changed):
+        start = time.perf_counter()
+        try:
+            build(False, template_file in changed)
+        except Exception:
+            # a mistake in the content should not stop the watching
+            traceback.print_exc()
+        watch.build_finished()
+        print('Rebuilt after changes in {} in {:.0f} ms'.format(', '.join(changed), (time.perf_counter() - start) * 1000))
+
+    watched_files = [input_content_file, template_file, 'styles.css', decisions_file or 'arxiv-decisions.json'] + [filename for kind, filename in bib_sources if kind == 'bib']
+    if icons != 'files':
+        watched_files += list(social_icons)
+    watch.watch(watched_files, rebuild)
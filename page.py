@@ -0,0 +1,324 @@
+import io
+import string
+import hashlib
+import json
+from datetime import date
+from os import makedirs, stat
+from os.path import exists, dirname, basename, abspath, join
+from profiling import stage, count
+from files import write_file
+from assets import icon_html, svg_sprite, responsive_template, social_icons
+from content import compile_content, save_content_cache, render_section
+# markdown and publications (which imports bibtexparser, pylatexenc and requests) 
+# take most of the start-up time, so they are imported only when something 
+# has to be rebuilt
+
+# Incremental builds: the hashes of all inputs and the rendered fragments of the page 
+# (sections, publications and the links bar) are stored in the manifest, 
+# so that the next build only renders the fragments whose inputs changed
+# the hashes are remembered with the modification times and sizes of the files, so that 
+# in the watch mode (see watch.py) the unchanged files (e.g., a big bibliography) are not read again
+file_hashes = dict()
+
+def file_hash(filename):
+    file_stat = stat(filename)
+    file_state = (file_stat.st_mtime_ns, file_stat.st_size)
+    if filename in file_hashes and file_hashes[filename][0] == file_state:
+        return file_hashes[filename][1]
+    with open(filename, 'rb') as f:
+        data = f.read()
+    count('bytes read', len(data))
+    file_hashes[filename] = (file_state, hashlib.sha1(data).hexdigest())
+    return file_hashes[filename][1]
+
+def fragment_key(*parts):
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+# a single bib file has the hash of its own, so that its fragments do not change
+def bibliography_hash(filenames):
+    if len(filenames) == 0:
+        return None
+    elif len(filenames) == 1:
+        return file_hash(filenames[0])
+    return fragment_key(*(file_hash(filename) for filename in filenames))
+
+# the icons embedded into the page (see assets.icon_modes) change it when the icon files change
+def embedded_icons_hash(icons):
+    if icons == 'files':
+        return None
+    return fragment_key(*(file_hash(icon) for icon in social_icons if exists(icon)))
+
+# fragments is a pair of dictionaries: the fragments of the previous build 
+# and the fragments used in this one (only they are saved to the manifest)
+def cached_fragment(fragments, key, render):
+    if fragments is None:
+        return render()
+    old_fragments, new_fragments = fragments
+    new_fragments[key] = old_fragments[key] if key in old_fragments else render()
+    return new_fragments[key]
+
+def generate_content(content_filename, read_bib_entries, change_conference_names = False, fragments = None, bib_hash = None, color = None, icons = 'files', decisions_filename = None, questions = 'ask',
+                     output_files = None, collapse_years = None, cache_folder = None, generator = None):
+    # the compiled content and its rendered paragraphs are kept in the cache folder
+    cache_filename = join(cache_folder, 'content.json') if cache_folder is not None else None
+    document, renders = compile_content(content_filename, file_hash(content_filename), cache_filename, generator)
+    name = document.name
+    links = document.links
+
+    def links_bar(links):
+        s = ''
+        icon_files = []
+        for link in links:
+            s == ' ' * 12
+            if 'dblp.org' in link:
+                icon_files.append("images/dblp.svg")
+                s += '<a href="{}" class="social-link" target="_blank">{}</a>\n'.format(link, icon_html("images/dblp.svg", color, icons))
+            elif 'scholar.google.com' in link:
+                icon_files.append("images/google-scholar.svg")
+                s += '<a href="{}" class="social-link" target="_blank">{}</a>\n'.format(link, icon_html("images/google-scholar.svg", color, icons))
+            elif 'instagram.com' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-instagram"></i></a>\n'.format(link)
+            elif 'twitter.com' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-twitter"></i></a>\n'.format(link)
+            elif 't.me' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-telegram"></i></a>\n'.format(link)
+            elif 'scopus.com' in link:
+                icon_files.append("images/scopus.svg")
+                s += '<a href="{}" class="social-link" target="_blank">{}</a>\n'.format(link, icon_html("images/scopus.svg", color, icons))
+            elif 'researchgate.net' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-researchgate"></i></a>\n'.format(link)
+            elif 'facebook.com' in link or 'fb.com' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-facebook"></i></a>\n'.format(link)
+            elif 'orcid.org' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-orcid"></i></a>\n'.format(link)
+            elif 'linkedin.com' in link:
+                s += '<a href="{}" class="social-link" target="_blank"><i class="fa-brands fa-linkedin"></i></a>\n'.format(link)
+            else:
+                print('WARNING: unsupported social link: {}'.format(link))
+        if icons == 'sprite' and icon_files:
+            s = svg_sprite(icon_files, color) + s
+        return s
+    
+    menu = ('\n' + ' ' * 12).join(['<li class="navi-item"><a href="#{}" onclick="close_sidebar()">{}</a></li>'.format(section.id(), section.menu_item()) for section in document.sections])
+    
+    # the content is a list of fragments, which are written to the page one by one,
+    # since concatenating them is quadratic for long lists of publications
+    content = []
+    decisions_hash = file_hash(decisions_filename) if decisions_filename is not None and exists(decisions_filename) else None
+
+    for section in document.sections:
+        content.append(' ' * 12 + '<div id = "{}">\n'.format(section.id()))
+        content.append(' ' * 16 + '<h1>{}</h1>\n'.format(section.title()))
+        if section.header == 'Publications' and read_bib_entries is not None: 
+            if output_files is None:
+                content.append(cached_fragment(fragments, fragment_key('publications', bib_hash, change_conference_names, decisions_hash, questions), 
+                                               lambda: publications_html(read_bib_entries, change_conference_names, decisions_filename, questions)))
+            else:
+                # the lazy publications come with the files for them, which are cached as well
+                def lazy_publications():
+                    files = dict()
+                    return publications_html(read_bib_entries, change_conference_names, decisions_filename, questions, files, collapse_years), files
+                html, files = cached_fragment(fragments, fragment_key('lazy publications', bib_hash, change_conference_names, decisions_hash, questions, collapse_years), 
+                                              lazy_publications)
+                content.append(html)
+                output_files.update(files)
+        content.append(cached_fragment(fragments, fragment_key('section', section.to_json()), lambda: render_section(section, renders)))
+        content.append(' ' * 12 + '</div>\n\n')
+
+    if cache_filename is not None:
+        save_content_cache(cache_filename)
+    return name, menu, cached_fragment(fragments, fragment_key('links', links, color, icons, embedded_icons_hash(icons)), lambda: links_bar(links)), content
+
+def publications_html(read_bib_entries, change_conference_names, decisions_filename=None, questions='ask', files=None, collapse_years=None):
+    from publications import gen_html_by_entries, load_latex_cache, save_latex_cache, latex_cache_stats, read_arxiv_decisions, save_arxiv_decisions
+    load_latex_cache()
+    decisions = read_arxiv_decisions(decisions_filename)
+    old_decisions = dict(decisions)
+    html = gen_html_by_entries(read_bib_entries(), change_conference_names, decisions, questions, files, collapse_years)
+    if decisions_filename is not None and decisions != old_decisions:
+        save_arxiv_decisions(decisions_filename, decisions)
+        print('The answers are saved to {}'.format(decisions_filename))
+    save_latex_cache()
+    stats = latex_cache_stats()
+    print('LaTeX conversions: {} (cached: {} in memory, {} on disk)'.format(stats['conversions'], stats['memory hits'], stats['disk hits']))
+    return html
+
+# The template is split once into the static text and the slots for the values, 
+# so that the page is written part by part instead of being formatted as one huge string.
+# The slots are the same as for str.format: {} or {0}, and {{ and }} are the brackets
+def split_template(template):
+    parts = []
+    next_slot = 0
+    for text, field, format_spec, conversion in string.Formatter().parse(template):
+        slot = None
+        if field is not None:
+            if field == '':
+                slot = next_slot
+                next_slot += 1
+            else:
+                slot = int(field)
+        parts.append((text, slot))
+    return parts
+
+# values are strings or lists of strings (e.g., the content)
+def write_page(f, template_parts, values):
+    for text, slot in template_parts:
+        f.write(text)
+        if slot is not None:
+            if isinstance(values[slot], str):
+                f.write(values[slot])
+            else:
+                f.writelines(values[slot])
+
+# Generates the page from the given content and bibliography into output_filename.
+# bib_filename and bib_link can be single bib files and DBLP links or lists of them, 
+# then all of them are merged without the duplicated papers, and a paper found in several
+# of them is taken from the first one. The DBLP links go first, unless the order is given by
+# bib_sources, a list of ('bib', filename) and ('dblp', link) pairs. The page is built reusing the parts of the previous build stored in cache_folder.
+# The template is passed as a string and the sidebar color is passed as well,
+# so that they can be read only once for many pages. icons is one of assets.icon_modes.
+# The answers about arXiv papers are kept in decisions_filename (by default, next to the content file),
+# and questions says what to do with a new question (see publications.match_arxiv_papers).
+# With lazy_publications the bibtex items (and the publications of the years older than 
+# the last collapse_years years) are written to separate files, which are loaded on demand.
+# If state (a dictionary) is given, the manifest, the fragments and the read bibliography are kept there
+# between the builds, so that a long-running generator does not read them from cache_folder every time
+# and does not parse the unchanged bib files again (e.g., after a change of arxiv-decisions.json).
+# With responsive_images the images of the template get resized copies (see assets.responsive_template).
+# With production the page and styles.css (next to the page) are minified and compressed (see production.py).
+# Returns False if nothing has changed since the previous build.
+def build_page(content_filename, template, output_filename, bib_filename=None, bib_link=None, change_conference_names=False,
+               color=None, offline=False, max_age=3600, full_rebuild=False, cache_folder='.cache', icons='files',
+               decisions_filename=None, questions='ask', lazy_publications=False, collapse_years=None, state=None,
+               responsive_images=False, production=False, bib_sources=None):
+    manifest_file = join(cache_folder, 'manifest.json')
+    fragments_file = join(cache_folder, 'fragments.json')
+    if decisions_filename is None:
+        decisions_filename = join(dirname(content_filename), 'arxiv-decisions.json')
+    output_folder = dirname(output_filename)
+    # the copies of the images are named after their hashes, so the changed images change the template
+    if responsive_images:
+        template = responsive_template(template, output_folder)
+
+    if bib_sources is None:
+        bib_sources = ([('dblp', link) for link in ([bib_link] if isinstance(bib_link, str) else bib_link or [])] + 
+                       [('bib', filename) for filename in ([bib_filename] if isinstance(bib_filename, str) else bib_filename or [])])
+    bib_links = [link for kind, link in bib_sources if kind == 'dblp']
+    dblp_filenames = dict()
+    if bib_links:
+        print('Downloading bibliography...')
+        from publications import fetch_bib_dblp_many
+        dblp_filenames = dict(zip(bib_links, fetch_bib_dblp_many(bib_links, max_age, offline)))
+    # the downloaded DBLP pages become bib files (if one of them is not available, 
+    # publications.BibliographyUnavailable is raised and the old page is kept)
+    bib_files = [(kind, dblp_filenames[value] if kind == 'dblp' else value) for kind, value in bib_sources]
+
+    read_bib_entries = None
+    if bib_files:
+        def read_bib_entries():
+            from publications import read_cached_bib, iter_bib_file, merge_bib_entries
+            # bib files can be huge (e.g., for a whole group), so they are read entry by entry
+            if state is not None and state.get('bibliography hash') == inputs['bibliography']:
+                entries = state['bibliography']
+            else:
+                sources = [read_cached_bib(filename).entries if kind == 'dblp' else iter_bib_file(filename) for kind, filename in bib_files]
+                entries = merge_bib_entries(sources)
+                if state is None:
+                    return entries
+                entries = list(entries)
+                state['bibliography hash'] = inputs['bibliography']
+                state['bibliography'] = entries
+            # normalize_entries changes the entries, so it gets their copies
+            return (dict(entry) for entry in entries)
+
+    # the fragments of the previous build are used only if the generator itself has not changed
+    script_folder = dirname(abspath(__file__))
+    inputs = {
+        'generator': fragment_key(*(file_hash(join(script_folder, script)) for script in ('page.py', 'publications.py', 'assets.py', 'content.py', 'production.py', 'files.py'))),
+        'content': file_hash(content_filename),
+        'bibliography': bibliography_hash([filename for kind, filename in bib_files]),
+        'decisions': file_hash(decisions_filename) if exists(decisions_filename) else None,
+        'template': hashlib.sha1(template.encode()).hexdigest(),
+        'color': color,
+        'icons': embedded_icons_hash(icons),
+        'options': [change_conference_names, icons, questions, lazy_publications, collapse_years, production],
+    }
+    if production:
+        inputs['styles'] = file_hash(join(output_folder, 'styles.css'))
+    manifest = {'inputs': dict()}
+    if not full_rebuild and state is not None and 'manifest' in state:
+        manifest = state['manifest']
+    elif not full_rebuild and exists(manifest_file):
+        with open(manifest_file, 'r') as f:
+            manifest = json.load(f)
+            count('bytes read', f.tell())
+
+    today = date.today().strftime("%d %B %Y")
+    page_key = fragment_key(inputs, abspath(output_filename), today)
+    if (manifest.get('page') == page_key and exists(output_filename) and file_hash(output_filename) == manifest['output']
+            and all(exists(join(output_folder, filename)) for filename in manifest.get('files', []))):
+        print('Nothing has changed since the last build')
+        return False
+
+    old_fragments = dict()
+    if manifest['inputs'].get('generator') == inputs['generator'] and state is not None and 'fragments' in state:
+        old_fragments = state['fragments']
+    elif manifest['inputs'].get('generator') == inputs['generator'] and exists(fragments_file):
+        with open(fragments_file, 'r') as f:
+            old_fragments = json.load(f)
+            count('bytes read', f.tell())
+    fragments = (old_fragments, dict())
+    output_files = dict() if lazy_publications else None
+    name, menu, links, content = generate_content(content_filename, read_bib_entries, change_conference_names, fragments, inputs['bibliography'], color, icons,
+                                                  decisions_filename, questions, output_files, collapse_years,
+                                                  cache_folder if not full_rebuild else None, inputs['generator'])
+    # the answers given during this build are its inputs as well
+    inputs['decisions'] = file_hash(decisions_filename) if exists(decisions_filename) else None
+    page_key = fragment_key(inputs, abspath(output_filename), today)
+
+    if production:
+        from production import minify_html, hashed_styles, compress_files
+        styles_name = hashed_styles(output_folder)
+        template = template.replace('href="styles.css"', 'href="{}"'.format(styles_name))
+        page = io.StringIO()
+        with stage('template fill'):
+            write_page(page, split_template(template), (name, menu, links, today, content))
+        with open(output_filename, 'w') as f, stage('minification'):
+            f.write(minify_html(page.getvalue()))
+            count('bytes written', f.tell())
+    else:
+        with open(output_filename, 'w') as f, stage('template fill'):
+            write_page(f, split_template(template), (name, menu, links, today, content))
+            count('bytes written', f.tell())
+    # the files are rewritten only if they changed
+    for filename, text in (output_files or dict()).items():
+        if production and filename.endswith('.html'):
+            text = minify_html(text)
+        filename = join(output_folder, filename)
+        if exists(filename):
+            with open(filename, 'r') as f:
+                if f.read() == text:
+                    continue
+        makedirs(dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            f.write(text)
+            count('bytes written', f.tell())
+
+    files = sorted(output_files or [])
+    if production:
+        files = sorted(files + [styles_name] + compress_files(output_folder, [basename(output_filename), styles_name] + files, join(cache_folder, 'compressed.json')))
+    else:
+        # the compressed copies of an earlier production build would be sent instead of the new files
+        from production import remove_compressed_files, remove_compressed_copies
+        remove_compressed_files(join(cache_folder, 'compressed.json'))
+        for filename in [basename(output_filename)] + files:
+            remove_compressed_copies(join(output_folder, filename))
+
+    # several generators can share the cache folder, so the files are replaced at once
+    write_file(fragments_file, json.dumps(fragments[1]).encode())
+    manifest = {'inputs': inputs, 'page': page_key, 'output': file_hash(output_filename), 'files': files}
+    write_file(manifest_file, json.dumps(manifest).encode())
+    if state is not None:
+        state['manifest'] = manifest
+        state['fragments'] = fragments[1]
+    return True
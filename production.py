@@ -0,0 +1,117 @@
+import re
+import gzip
+import json
+import hashlib
+from os import listdir, remove
+from os.path import join, exists
+from profiling import stage, count
+from files import write_file
+
+# Production mode: the page and the styles are minified, the styles get a name with the hash
+# of their content (so that the browsers can keep them for a long time and still never use
+# an old version), and the files get compressed .gz and .br copies next to them, which a static
+# web server (e.g., nginx with gzip_static and brotli_static) sends as they are, instead of
+# compressing the files for every request or sending them uncompressed.
+# The .br copies need the brotli library, without it only the .gz copies are written.
+
+# the text of <pre> (the bibtex items) and <textarea> is kept as it is,
+# and the scripts only lose their indentation, since a line break can end a statement there
+def minify_html(html):
+    parts = re.split(r'(<pre[\s>].*?</pre>|<textarea[\s>].*?</textarea>|<script[\s>].*?</script>)', html, flags=re.DOTALL | re.IGNORECASE)
+    for i in range(len(parts)):
+        if i % 2 == 0:
+            text = re.sub(r'<!--(?!\[).*?-->', '', parts[i], flags=re.DOTALL)
+            parts[i] = re.sub(r'\s+', lambda match: '\n' if '\n' in match.group(0) else ' ', text)
+        elif parts[i][:7].lower() == '<script':
+            parts[i] = re.sub(r'\n\s*', '\n', parts[i])
+    return ''.join(parts)
+
+# the spaces before a colon are kept, since in a selector they mean a descendant ("a :hover")
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+# Writes the minified styles to styles.<hash>.css (if there is no such file yet)
+# and removes the older versions with their compressed copies, returns the new name
+def hashed_styles(output_folder, styles_filename='styles.css'):
+    with open(join(output_folder, styles_filename), 'r') as f:
+        css = minify_css(f.read())
+        count('bytes read', f.tell())
+    styles_hash = hashlib.sha1(css.encode()).hexdigest()[:10]
+    name = 'styles.{}.css'.format(styles_hash)
+    if not exists(join(output_folder, name)):
+        write_file(join(output_folder, name), css.encode())
+        for filename in listdir(output_folder or '.'):
+            match = re.match(r'styles\.([0-9a-f]{10})\.css(\.gz|\.br)?$', filename)
+            if match is not None and match.group(1) != styles_hash:
+                remove(join(output_folder, filename))
+    return name
+
+def read_compressed_hashes(state_filename):
+    try:
+        with open(state_filename, 'r') as f:
+            hashes = json.load(f)
+            count('bytes read', f.tell())
+    except (OSError, ValueError):
+        hashes = dict()
+    return hashes
+
+def remove_compressed_copies(path):
+    for extension in ('.gz', '.br'):
+        if exists(path + extension):
+            remove(path + extension)
+
+# Writes the .gz and .br copies of the files (given relative to output_folder), but only of those
+# whose content changed since they were compressed last time, these hashes are kept in state_filename.
+# The copies of the files compressed before but not given now are removed, since the web server
+# would send them instead of the missing files. Returns the names of the compressed copies
+def compress_files(output_folder, filenames, state_filename):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print('WARNING: brotli is not installed (pip install brotli), so only the .gz copies are written')
+    hashes = read_compressed_hashes(state_filename)
+    copies = []
+    changed = False
+    paths = set(join(output_folder, filename) for filename in filenames)
+    for path in [path for path in hashes if path not in paths]:
+        remove_compressed_copies(path)
+        del hashes[path]
+        changed = True
+    for filename in filenames:
+        path = join(output_folder, filename)
+        with open(path, 'rb') as f:
+            data = f.read()
+        count('bytes read', len(data))
+        content_hash = hashlib.sha1(data).hexdigest()
+        extensions = ['.gz', '.br'] if brotli is not None else ['.gz']
+        if hashes.get(path) != content_hash or not all(exists(path + extension) for extension in extensions):
+            with stage('compression'):
+                # without mtime the .gz copy depends only on the content
+                write_file(path + '.gz', gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    write_file(path + '.br', brotli.compress(data, quality=11))
+                elif exists(path + '.br'):
+                    # an old .br copy would be sent instead of the new file
+                    remove(path + '.br')
+            count('files compressed')
+            hashes[path] = content_hash
+            changed = True
+        copies += [filename + extension for extension in extensions]
+
+    if changed:
+        write_file(state_filename, json.dumps(hashes).encode())
+    return copies
+
+# After a build without the production mode the page and its files are not compressed,
+# so their old compressed copies are removed, otherwise the web server would send them
+def remove_compressed_files(state_filename):
+    if not exists(state_filename):
+        return
+    for path in read_compressed_hashes(state_filename):
+        remove_compressed_copies(path)
+    remove(state_filename)
@@ -0,0 +1,84 @@
+import json
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Instrumentation of the generator for the --profile argument. The stages of the
+# build (downloading, parsing, matching, LaTeX conversion, markdown rendering, etc.)
+# are timed, both wall and CPU time, and the key operations are counted.
+# Unless enable() is called, a stage and a counter cost only one check.
+# The stages can be nested, then the time of the inner stage is also included
+# into the time of the outer one, but not into its own ("self") time.
+enabled = False
+stages = dict()
+counters = dict()
+# the stages being run, each one is [name, wall start, cpu start, wall time of inner stages]
+running = []
+# stage name -> cProfile profiler, only if the profiler dump is requested.
+# Only the innermost running stage is profiled, so each profile shows the own work of its stage
+profilers = None
+
+def enable(profile_functions=False):
+    global enabled, profilers
+    enabled = True
+    if profile_functions:
+        profilers = dict()
+
+def count(name, n=1):
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+# the stages run in other threads (e.g., parallel downloads) are not timed,
+# they should be timed as a whole in the main thread
+@contextmanager
+def stage(name):
+    if not enabled or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    if profilers is not None:
+        if running:
+            profilers[running[-1][0]].disable()
+        profilers.setdefault(name, cProfile.Profile()).enable()
+    running.append([name, time.perf_counter(), time.process_time(), 0.0])
+    try:
+        yield
+    finally:
+        _, wall_start, cpu_start, inner_time = running.pop()
+        wall_time = time.perf_counter() - wall_start
+        stats = stages.setdefault(name, {'calls': 0, 'wall': 0.0, 'self': 0.0, 'cpu': 0.0})
+        stats['calls'] += 1
+        stats['wall'] += wall_time
+        stats['self'] += wall_time - inner_time
+        stats['cpu'] += time.process_time() - cpu_start
+        if running:
+            running[-1][3] += wall_time
+        if profilers is not None:
+            profilers[name].disable()
+            if running:
+                profilers[running[-1][0]].enable()
+
+def report():
+    return {'stages': stages, 'counters': counters}
+
+def print_report():
+    print()
+    print('{:<28} {:>7} {:>10} {:>10} {:>10}'.format('stage', 'calls', 'wall, s', 'self, s', 'cpu, s'))
+    for name, stats in sorted(stages.items(), key=lambda item: -item[1]['wall']):
+        print('{:<28} {:>7} {:>10.3f} {:>10.3f} {:>10.3f}'.format(name, stats['calls'], stats['wall'], stats['self'], stats['cpu']))
+    print()
+    for name, value in sorted(counters.items()):
+        print('{:<28} {:>7}'.format(name, value))
+
+def save_report(filename):
+    with open(filename, 'w') as f:
+        json.dump(report(), f, indent=4)
+
+# the stage with the largest own time is the hottest one,
+# its profile can be read with pstats or any other viewer of cProfile dumps
+def dump_hottest_stage(filename):
+    if not profilers:
+        return None
+    name = max(profilers, key=lambda name: stages[name]['self'])
+    profilers[name].dump_stats(filename)
+    return name
@@ -1,154 +1,541 @@
 import bibtexparser
+from bibtexparser.bparser import BibTexParser
 import Levenshtein
 import re
 import requests
-import io
+import hashlib
+import json
+import pickle
+import time
+from os import stat
+from os.path import exists, join, splitext
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from pylatexenc.latex2text import LatexNodes2Text
+from pylatexenc.version import version_str as pylatexenc_version
+from profiling import stage, count
+from files import write_file
 tex_converter = LatexNodes2Text()
 
 def read_bib_file(filename):
     with open(filename, 'r') as f:
         bib_database = bibtexparser.load(f)
     return bib_database
-    
-def read_bib_dblp(profile_link):
+
+# Reads the entries of a bib file one by one, so that the whole text of the file
+# is never held in memory (the parsed entries still are, see normalize_entries).
+# The entries are cut out of the file by counting the brackets and parsed in small
+# batches by the same parser (so that @string macros still work), and the entries
+# of skip_types are not even parsed.
+def iter_bib_file(filename, skip_types=('phdthesis', 'misc'), batch_size=1 << 16):
+    parser = BibTexParser()
+    parser.expect_multiple_parse = True
+
+    def parse(text):
+        with stage('bib parsing'):
+            parser.parse(text)
+        entries = parser.bib_database.entries
+        parser.bib_database.entries = []
+        parser.bib_database.comments = []
+        parser.bib_database.preambles = []
+        return entries
+
+    with open(filename, 'r') as f:
+        batch = []
+        batch_length = 0
+        chunk = []
+        depth = 0
+        opening = None
+        for line in f:
+            while line:
+                if not chunk:
+                    # the text between the entries is ignored by bibtex, including
+                    # the @ which do not start an entry (e.g., in e-mail addresses)
+                    start = re.search(r'@\s*\w+', line)
+                    if start is None:
+                        break
+                    line = line[start.start():]
+                chunk.append(line)
+                if opening is None:
+                    # the bracket can be on one of the next lines ("@article\n{key,")
+                    text = ''.join(chunk)
+                    match = re.match(r'@\s*\w+\s*([{(])', text)
+                    if match is None:
+                        if re.fullmatch(r'@\s*\w+\s*', text):
+                            break
+                        # not an entry, the text after the @ is searched again
+                        chunk = []
+                        line = text[1:]
+                        continue
+                    opening = match.group(1)
+                    closing = '}' if opening == '{' else ')'
+                depth += line.count(opening) - line.count(closing)
+                if depth > 0:
+                    break
+
+                entry_type = re.match(r'@\s*(\w+)', chunk[0]).group(1).lower()
+                if entry_type not in skip_types:
+                    batch.append(''.join(chunk))
+                    batch_length += len(batch[-1])
+                    if batch_length >= batch_size:
+                        yield from parse(''.join(batch))
+                        batch = []
+                        batch_length = 0
+                chunk = []
+                depth = 0
+                opening = None
+                break
+        count('bytes read', f.buffer.tell())
+        if batch:
+            yield from parse(''.join(batch))
+
+# DBLP exports are cached in cache_dir: the raw bib file, its parsed version 
+# and the ETag/Last-Modified headers, which are used to ask DBLP whether the 
+# bibliography has changed. A cache younger than max_age seconds is used 
+# without asking DBLP at all, and in offline mode only the cache is used.
+cache_dir = '.cache'
+session = requests.Session()
+
+# a page without some publications should not replace the old one, so
+# a bibliography which cannot be downloaded and is not cached stops the build
+class BibliographyUnavailable(Exception):
+    pass
+
+def read_bib_dblp(profile_link, max_age=3600, offline=False, timeout=30):
+    return read_cached_bib(fetch_bib_dblp(profile_link, max_age, offline, timeout))
+
+# returns the name of the cached raw bib file
+def fetch_bib_dblp(profile_link, max_age=3600, offline=False, timeout=30):
     bib_link = re.sub(r'html$', 'bib?param=1', profile_link)
-    return bibtexparser.load(io.StringIO(requests.get(bib_link, allow_redirects=True).content.decode('UTF-8')))
+    cache_name = join(cache_dir, 'dblp-' + hashlib.sha1(bib_link.encode()).hexdigest())
+    meta = None
+    if exists(cache_name + '.json') and exists(cache_name + '.bib'):
+        with open(cache_name + '.json', 'r') as f:
+            meta = json.load(f)
+
+    if meta is not None and (offline or time.time() - meta['fetched'] < max_age):
+        return cache_name + '.bib'
+    if offline:
+        raise BibliographyUnavailable('no cached bibliography for {}, cannot work offline'.format(profile_link))
+
+    headers = dict()
+    if meta is not None and meta['etag'] is not None:
+        headers['If-None-Match'] = meta['etag']
+    if meta is not None and meta['last-modified'] is not None:
+        headers['If-Modified-Since'] = meta['last-modified']
+    try:
+        with stage('dblp download'):
+            response = session.get(bib_link, headers=headers, allow_redirects=True, timeout=timeout)
+        count('bytes downloaded', len(response.content))
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if meta is None:
+            raise BibliographyUnavailable('could not download the bibliography for {} ({})'.format(profile_link, e))
+        print('WARNING: could not download the bibliography ({}), using the cached one from {}'.format(e, time.ctime(meta['fetched'])))
+        return cache_name + '.bib'
+
+    if response.status_code != 304:
+        # the parsed version of the old file is not used anymore (see read_cached_bib)
+        write_file(cache_name + '.bib', response.content)
+    write_file(cache_name + '.json', json.dumps({'link': bib_link, 'fetched': time.time(), 
+                                                       'etag': response.headers.get('ETag', meta['etag'] if meta else None), 
+                                                       'last-modified': response.headers.get('Last-Modified', meta['last-modified'] if meta else None)}).encode())
+    return cache_name + '.bib'
+
+# Several DBLP pages (e.g., of all members of a group) are downloaded at the same time,
+# so that it takes about as long as the slowest of them. The threads share the session,
+# which keeps a pool of connections (up to 10, so there are at most 8 threads).
+# Returns the names of the cached raw bib files, raises BibliographyUnavailable if some page is not available.
+def fetch_bib_dblp_many(profile_links, max_age=3600, offline=False, timeout=30):
+    if len(profile_links) == 1:
+        return [fetch_bib_dblp(profile_links[0], max_age, offline, timeout)]
+    with stage('dblp download'), ThreadPoolExecutor(max_workers=min(len(profile_links), 8)) as executor:
+        return list(executor.map(lambda link: fetch_bib_dblp(link, max_age, offline, timeout), profile_links))
+
+# The parsed database is pickled next to the raw file, since parsing is slow. The pickle keeps
+# the modification time and size of the raw file it was made from, so that a pickle made from 
+# an older version of the file (e.g., by another generator while the file was downloaded) is not used
+def read_cached_bib(bib_filename):
+    cache_name = splitext(bib_filename)[0]
+    bib_stat = stat(bib_filename)
+    bib_state = (bib_stat.st_mtime_ns, bib_stat.st_size)
+    if exists(cache_name + '.pickle'):
+        try:
+            with open(cache_name + '.pickle', 'rb') as f, stage('bib parsing'):
+                state, bib_database = pickle.load(f)
+                count('bytes read', f.tell())
+            if state == bib_state:
+                return bib_database
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+            pass
+    with open(bib_filename, 'r', encoding='UTF-8') as f, stage('bib parsing'):
+        bib_database = bibtexparser.load(f)
+        count('bytes read', f.tell())
+    write_file(cache_name + '.pickle', pickle.dumps((bib_state, bib_database)))
+    return bib_database
     
 
-def gen_html_by_database(bib_database, rename_conferences=False):
-    # get rid of PhD thesis, it should not be in the list of publications
-    # also I am lazy to process @misc items
-    bib_database.entries = [entry for entry in bib_database.entries if entry['ENTRYTYPE'] not in ('phdthesis', 'misc')]
-
-    # shortening IDs, DBLP format is too long and is not convenient to use
-    for entry in bib_database.entries:
-        # IDsuffix is needed to get rid of the duplicated IDs later
-        entry['IDsuffix'] = entry['ID'].split('/')[-2]
-        entry['ID'] = entry['ID'].split('/')[-1]
-
-    # searching for duplicated IDs
-    appearances = dict()
-    for entry in bib_database.entries:
-        if entry['ID'] in appearances:
-            appearances[entry['ID']] += 1
-        else:
-            appearances[entry['ID']] = 1
-    duplicated_ids = [i for i in appearances if appearances[i] > 1]
+# Converting titles and authors from LaTeX to HTML with pylatexenc is slow,
+# and the same author lists appear in many entries, so the converted strings 
+# are memoized in memory and, if load_latex_cache was called, also on disk,
+# so that an unchanged bibliography does not need pylatexenc at all
+latex_cache = None
+latex_cache_filename = None
+latex_cache_changed = False
+latex_stats = {'disk hits': 0, 'conversions': 0}
 
-    # changing duplicated IDs
-    for entry in bib_database.entries:
-        if entry['ID'] in duplicated_ids:
-            entry['ID'] = entry['ID'] + entry['IDsuffix']
-        
-    # removing unnecessary fields
-    for entry in bib_database.entries:
+@lru_cache(maxsize=1 << 16)
+def latex_to_html(latex):
+    global latex_cache_changed
+    if latex_cache is not None and latex in latex_cache:
+        latex_stats['disk hits'] += 1
+        return latex_cache[latex]
+    latex_stats['conversions'] += 1
+    count('latex conversions')
+    with stage('latex conversion'):
+        html = tex_converter.latex_to_text(latex).encode('ascii', 'xmlcharrefreplace').decode()
+    if latex_cache is not None:
+        latex_cache[latex] = html
+        latex_cache_changed = True
+    return html
+
+def latex_cache_stats():
+    return {'memory hits': latex_to_html.cache_info().hits, 'disk hits': latex_stats['disk hits'], 'conversions': latex_stats['conversions']}
+
+# the conversions of another version of pylatexenc are not used
+def read_latex_cache_file(filename):
+    if exists(filename):
+        try:
+            with open(filename, 'r') as f:
+                stored = json.load(f)
+                count('bytes read', f.tell())
+            if stored['pylatexenc'] == pylatexenc_version:
+                return stored['strings']
+        except (ValueError, KeyError):
+            pass
+    return dict()
+
+def load_latex_cache(filename=join(cache_dir, 'latex.json')):
+    global latex_cache, latex_cache_filename
+    if latex_cache_filename != filename:
+        latex_cache = read_latex_cache_file(filename)
+        latex_cache_filename = filename
+
+# several generators can work at the same time, so the file is merged 
+# with its current version and replaced at once
+def save_latex_cache():
+    global latex_cache_changed
+    if latex_cache is None or not latex_cache_changed:
+        return
+    strings = read_latex_cache_file(latex_cache_filename)
+    strings.update(latex_cache)
+    write_file(latex_cache_filename, json.dumps({'pylatexenc': pylatexenc_version, 'strings': strings}).encode())
+    latex_cache_changed = False
+
+
+# Fuzzy title matching of arXiv papers to their reviewed versions.
+# Comparing every arXiv title with every other title is quadratic, which is
+# too slow for big (e.g., merged group) bibliographies, so the titles are
+# indexed PassJoin-style: each title is split into max_distance + 1 segments,
+# and by the pigeonhole principle any title within max_distance edits of it 
+# contains one of these segments unchanged and only slightly shifted. So we
+# only compute the edit distance for the titles which share such a segment,
+# and the result is the same as for the full scan.
+def title_segments(length, max_distance):
+    parts = max_distance + 1
+    short_length, long_parts = divmod(length, parts)
+    segments = []
+    start = 0
+    for i in range(parts):
+        end = start + short_length + (1 if i >= parts - long_parts else 0)
+        segments.append((start, end))
+        start = end
+    return segments
+
+def build_title_index(titles, max_distance=9):
+    buckets = dict()
+    for i, title in enumerate(titles):
+        if len(title) not in buckets:
+            buckets[len(title)] = (title_segments(len(title), max_distance), [dict() for _ in range(max_distance + 1)])
+        segments, segment_ids = buckets[len(title)]
+        for segment, (start, end) in enumerate(segments):
+            segment_ids[segment].setdefault(title[start:end], []).append(i)
+    return {'titles': titles, 'max_distance': max_distance, 'buckets': buckets}
+
+# returns the indices (in the indexed order) of all titles 
+# which are at most max_distance edits away from the given one
+def find_similar_titles(title_index, title):
+    max_distance = title_index['max_distance']
+    buckets = title_index['buckets']
+    candidates = set()
+    for length in range(max(len(title) - max_distance, 0), len(title) + max_distance + 1):
+        if length not in buckets:
+            continue
+        # an unchanged segment can only be shifted by a half of the edits which are not spent
+        # on the length difference, and it is enough to look for the first unchanged segment 
+        # from the left or from the right, so the middle segments can be shifted even less
+        delta = len(title) - length
+        segments, segment_ids = buckets[length]
+        for segment, (start, end) in enumerate(segments):
+            segment_length = end - start
+            first = max(start - (max_distance - delta) // 2, start - segment, start + delta - (max_distance - segment), 0)
+            last = min(start + (max_distance + delta) // 2, start + segment, start + delta + (max_distance - segment), len(title) - segment_length)
+            for position in range(first, last + 1):
+                ids = segment_ids[segment].get(title[position:position + segment_length])
+                if ids is not None:
+                    candidates.update(ids)
+    # the distances are computed only for the candidates
+    titles = title_index['titles']
+    count('levenshtein calls', len(candidates))
+    return [i for i in sorted(candidates) if Levenshtein.distance(title, titles[i]) <= max_distance]
+
+
+# A publication after the normalization: the type, the short ID, the fields 
+# of the bibtex entry and the link to its arXiv version. The bibtex item is 
+# written only when it is shown, instead of storing a copy of every entry.
+class Publication:
+    __slots__ = ('id', 'entry_type', 'fields', 'arxiv_link')
+
+    def __init__(self, entry_id, entry_type, fields):
+        self.id = entry_id
+        self.entry_type = entry_type
+        self.fields = fields
+        self.arxiv_link = None
+
+    def bibtex(self):
+        return write_entry(self.id, self.fields)
+
+# All changes of the entries are done in one pass over the bibliography,
+# only the duplicated IDs are fixed when all IDs are known
+def normalize_entries(entries, rename_conferences=False):
+    publications = []
+    # IDsuffix is needed to get rid of the duplicated IDs later
+    id_suffixes = dict()
+    for entry in entries:
+        # get rid of PhD thesis, it should not be in the list of publications
+        # also I am lazy to process @misc items
+        if entry['ENTRYTYPE'] in ('phdthesis', 'misc'):
+            continue
+
+        # shortening IDs, DBLP format is too long and is not convenient to use
+        id_suffix = entry['ID'].split('/')[-2]
+        publication = Publication(entry['ID'].split('/')[-1], entry['ENTRYTYPE'], entry)
+
+        # removing unnecessary fields
         opt_fields = ['url', 'doi', 'eprinttype', 'eprint']
         for field in opt_fields:
             if field in entry:
                 entry['OPT' + field] = entry.pop(field)
         if 'editor' in entry and entry['ENTRYTYPE'] != 'book':
             entry['OPTeditor'] = entry.pop('editor')
-        unnecessary_fields = ['timestamp', 'biburl', 'bibsource', 'IDsuffix']
+        unnecessary_fields = ['timestamp', 'biburl', 'bibsource']
         for field in unnecessary_fields:
             if field in entry:
                 del entry[field]
 
-    # renaming conferences and journals, 
-    # this part of the script must be customized according to your personal needs and preferences
-    if rename_conferences:
-        for entry in bib_database.entries:
-            if entry['ENTRYTYPE'] == 'inproceedings':
-                if 'booktitle' not in entry:
-                    continue
-                # GECCO
-                if 'GECCO' in entry['booktitle']:
-                    if 'Companion' in entry['booktitle']:
-                        entry['booktitle'] = 'Genetic and Evolutionary Computation Conference Companion, {{GECCO}} {}'.format(entry['year'])
-                    else:
-                        entry['booktitle'] = 'Genetic and Evolutionary Computation Conference, {{GECCO}} {}'.format(entry['year'])
-                # PPSN
-                if 'PPSN' in entry['booktitle']:
-                    if 'Part' in entry['booktitle']: 
-                        # I am counting on the part being in the end of the booktitle
-                        entry['booktitle'] = 'Parallel Problem Solving from Nature, {{PPSN}} {}, Part {}'.format(entry['year'], entry['booktitle'].split()[-1])
-                    else:
-                        entry['booktitle'] = 'Parallel Problem Solving from Nature, {{PPSN}} {}'.format(entry['year'])
-                # FOGA
-                if 'FOGA' in entry['booktitle']:
-                    entry['booktitle'] = 'Foundations of Genetic Algorithms, {{FOGA}} {}'.format(entry['year'])
-                # CEC
-                if 'CEC' in entry['booktitle']:
-                    entry['booktitle'] = 'Congress on Evolutionary Computation, {{CEC}} {}'.format(entry['year'])
-                # EvoCOP
-                if 'EvoCOP' in entry['booktitle']:
-                    entry['booktitle'] = 'Evolutionary Computation in Combinatorial Optimization, {{E}}vo{{COP}} {}'.format(entry['year'])
-            if entry['ENTRYTYPE'] == 'article':
-                if 'journal' not in entry:
-                    continue
-                if entry['journal'] == '{ACM} Trans. Evol. Learn. Optim.':
-                    entry['journal'] = '{ACM} Transactions on Evolutionary Learning and Optimization'
-                
+        if rename_conferences:
+            rename_venue(entry)
 
-    # writer in bibtexparser library messes up the order of items, 
-    # and its alignment is far from beautiful, so I have to write my own writer
-    def write_entry(entry):
-        # the following value is needed for beautiful alignment
-        longest_field_name = max(len(field_name) for field_name in entry.keys() if field_name != 'ENTRYTYPE')
-
-        s = '@article{{{},\n'.format(entry['ID'])
-        # the preferred order of fields can be defined here 
-        fields_order = ['author', 'OPTeditor', 'editor', 'title', 'booktitle', 'journal', 'volume', 'number', 'series', 'pages', 'publisher', 'year']
-        
-        # we first write the fields from the order we defined
-        for field in fields_order:
-            if field in entry:
-                # 
-                s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
-        
-        # then we write the rest of non-OPT fields
-        for field in entry:
-            if field not in fields_order and field[:3] != 'OPT' and field != 'ENTRYTYPE' and field != 'ID':
-                s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
-
-        # OPT fields come the last
-        for field in entry:
-            if field[:3] == 'OPT' and field not in fields_order and field != 'ENTRYTYPE' and field != 'ID':
-                s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
-        s += '}\n'
+        publications.append(publication)
+        id_suffixes.setdefault(publication.id, []).append((publication, id_suffix))
 
-        return s
+    # changing duplicated IDs
+    for same_id in id_suffixes.values():
+        if len(same_id) > 1:
+            for publication, id_suffix in same_id:
+                publication.id = publication.id + id_suffix
+    return publications
+
+# renaming conferences and journals, 
+# this part of the script must be customized according to your personal needs and preferences
+def rename_venue(entry):
+    if entry['ENTRYTYPE'] == 'inproceedings':
+        if 'booktitle' not in entry:
+            return
+        # GECCO
+        if 'GECCO' in entry['booktitle']:
+            if 'Companion' in entry['booktitle']:
+                entry['booktitle'] = 'Genetic and Evolutionary Computation Conference Companion, {{GECCO}} {}'.format(entry['year'])
+            else:
+                entry['booktitle'] = 'Genetic and Evolutionary Computation Conference, {{GECCO}} {}'.format(entry['year'])
+        # PPSN
+        if 'PPSN' in entry['booktitle']:
+            if 'Part' in entry['booktitle']: 
+                # I am counting on the part being in the end of the booktitle
+                entry['booktitle'] = 'Parallel Problem Solving from Nature, {{PPSN}} {}, Part {}'.format(entry['year'], entry['booktitle'].split()[-1])
+            else:
+                entry['booktitle'] = 'Parallel Problem Solving from Nature, {{PPSN}} {}'.format(entry['year'])
+        # FOGA
+        if 'FOGA' in entry['booktitle']:
+            entry['booktitle'] = 'Foundations of Genetic Algorithms, {{FOGA}} {}'.format(entry['year'])
+        # CEC
+        if 'CEC' in entry['booktitle']:
+            entry['booktitle'] = 'Congress on Evolutionary Computation, {{CEC}} {}'.format(entry['year'])
+        # EvoCOP
+        if 'EvoCOP' in entry['booktitle']:
+            entry['booktitle'] = 'Evolutionary Computation in Combinatorial Optimization, {{E}}vo{{COP}} {}'.format(entry['year'])
+    if entry['ENTRYTYPE'] == 'article':
+        if 'journal' not in entry:
+            return
+        if entry['journal'] == '{ACM} Trans. Evol. Learn. Optim.':
+            entry['journal'] = '{ACM} Transactions on Evolutionary Learning and Optimization'
+
+# writer in bibtexparser library messes up the order of items, 
+# and its alignment is far from beautiful, so I have to write my own writer
+def write_entry(entry_id, entry):
+    # the following value is needed for beautiful alignment
+    longest_field_name = max(len(field_name) for field_name in entry.keys() if field_name != 'ENTRYTYPE')
+
+    s = '@article{{{},\n'.format(entry_id)
+    # the preferred order of fields can be defined here 
+    fields_order = ['author', 'OPTeditor', 'editor', 'title', 'booktitle', 'journal', 'volume', 'number', 'series', 'pages', 'publisher', 'year']
+
+    # we first write the fields from the order we defined
+    for field in fields_order:
+        if field in entry:
+            # 
+            s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
+
+    # then we write the rest of non-OPT fields
+    for field in entry:
+        if field not in fields_order and field[:3] != 'OPT' and field != 'ENTRYTYPE' and field != 'ID':
+            s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
+
+    # OPT fields come the last
+    for field in entry:
+        if field[:3] == 'OPT' and field not in fields_order and field != 'ENTRYTYPE' and field != 'ID':
+            s += '    {} = {{{}}},\n'.format(field.ljust(longest_field_name + 1, ' '), entry[field].replace('\n', '\n' + ' ' * (longest_field_name + 9)))
+    s += '}\n'
+
+    return s
+
+
+# Merging several bibliographies (lists or iterators of bibtexparser entries) into one. 
+# Co-authors have the same papers in their DBLP exports, and a bib file can have the same
+# papers as DBLP under other IDs, so a paper is skipped if its DOI, its ID or its normalized 
+# title together with its venue and year are already seen (an arXiv version has the same title
+# but another venue, so it is not a duplicate). The first version of a paper is kept.
+# Only the papers of the previous sources are skipped: one bibliography is shown as it is,
+# also if it has the same paper twice, so a single source (or the same one given twice) 
+# gives the same page as before the merging.
+def normalized_text(text):
+    return re.sub(r'[^a-z0-9]', '', text.casefold())
+
+def paper_keys(entry):
+    keys = [('id', entry['ID'])]
+    if 'doi' in entry:
+        keys.append(('doi', entry['doi'].casefold()))
+    if 'title' in entry:
+        venue = entry.get('journal', entry.get('booktitle', entry['ENTRYTYPE']))
+        keys.append(('title', hashlib.sha1('{}|{}|{}'.format(normalized_text(entry['title']), normalized_text(venue), entry.get('year')).encode()).hexdigest()))
+    return keys
+
+def merge_bib_entries(sources):
+    seen = set()
+    for source in sources:
+        source_keys = set()
+        for entry in source:
+            keys = paper_keys(entry)
+            if any(key in seen for key in keys):
+                count('duplicates removed')
+                continue
+            source_keys.update(keys)
+            yield entry
+        seen.update(source_keys)
 
-    # adding the well-formatted bib item as a string 
-    for entry in bib_database.entries:
-        entry['bibstr'] = write_entry(entry)
+def gen_html_by_database(bib_database, rename_conferences=False, decisions=None, questions='ask', files=None, collapse_years=None):
+    return gen_html_by_entries(bib_database.entries, rename_conferences, decisions, questions, files, collapse_years)
 
-    # matching arxiv papers to the conference or journal ones by title
+# entries can be any iterable of bibtexparser entries, e.g., iter_bib_file
+def gen_html_by_entries(entries, rename_conferences=False, decisions=None, questions='ask', files=None, collapse_years=None):
+    with stage('normalization'):
+        publications = normalize_entries(entries, rename_conferences)
+    with stage('arxiv matching'):
+        publications = match_arxiv_papers(publications, decisions, questions)
+    with stage('publications rendering'):
+        return render_publications(publications, files, collapse_years)
+
+# The answers to the questions about the arXiv papers are stored in a decision file,
+# so that each question is asked only once. It maps the arXiv number of the paper to
+# the ID of its reviewed version, to 'journal' (show it as an arXiv paper) or to 'hide'.
+# The file can also be written by hand, e.g., to build the page without any questions.
+arxiv_decision_modes = ('ask', 'fail', 'defer')
+
+class UndecidedArxivPapers(Exception):
+    pass
+
+def arxiv_number(entry):
+    return entry.fields['volume'].split('/')[-1]
+
+def read_arxiv_decisions(filename):
+    if filename is None or not exists(filename):
+        return dict()
+    with open(filename, 'r') as f:
+        decisions = json.load(f)
+        count('bytes read', f.tell())
+    return decisions
+
+def save_arxiv_decisions(filename, decisions):
+    write_file(filename, json.dumps(decisions, indent=4, sort_keys=True).encode())
+
+# matching arxiv papers to the conference or journal ones by title,
+# returns the publications which should be shown.
+# The decisions (see above) are applied first, and the new answers are added to them.
+# If questions is 'fail', UndecidedArxivPapers is raised instead of asking anything,
+# and if it is 'defer', such papers are shown as arXiv papers until they are decided.
+def match_arxiv_papers(entries, decisions=None, questions='ask'):
+    if decisions is None:
+        decisions = dict()
     matched_ids = set()
+    undecided = []
+    venue_entries = [entry for entry in entries if entry.fields.get('journal') != 'CoRR']
+    entries_by_id = dict()
+    for entry in entries:
+        entries_by_id.setdefault(entry.id, entry)
+    title_index = None
+
+    for entry in entries:
+        if entry.fields.get('journal') == 'CoRR':
+            decision = decisions.get(arxiv_number(entry))
+            if decision == 'journal':
+                continue
+            elif decision == 'hide':
+                matched_ids.add(entry.id)
+                entry.arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                continue
+            elif decision is not None:
+                if decision in entries_by_id:
+                    entries_by_id[decision].arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                    matched_ids.add(entry.id)
+                    continue
+                print('WARNING: the paper {} decided for arXiv paper {} is not in the bibliography'.format(decision, arxiv_number(entry)))
 
-    for entry in bib_database.entries:
-        if 'journal' in entry and entry['journal'] == 'CoRR':
             # find entries with the same title
             # beware of too similar titles of different papers! 
             # the Levenshtein distance is used to get rid of stupid
             # small differences in the bibtex titles taken from dblp
-            for other_entry in bib_database.entries:
-                if ('journal' not in other_entry or other_entry['journal'] != 'CoRR') and Levenshtein.distance(entry['title'].casefold(), other_entry['title'].casefold()) < 10:
-                    if 'arxiv-link' in other_entry:
-                        print('WARNING: replacing arXiv link for item {}'.format(other_entry['ID']))
-                    other_entry['arxiv-link'] = 'https://arxiv.org/{}'.format(entry['volume'])
-                    print('Added link to arxiv paper {} to paper {}'.format(entry['OPTeprint'], other_entry['ID']))
-                    if entry['ID'] not in matched_ids:
-                        matched_ids.add(entry['ID'])
+            if title_index is None:
+                title_index = build_title_index([other_entry.fields['title'].casefold() for other_entry in venue_entries])
+            for i in find_similar_titles(title_index, entry.fields['title'].casefold()):
+                other_entry = venue_entries[i]
+                if other_entry.arxiv_link is not None:
+                    print('WARNING: replacing arXiv link for item {}'.format(other_entry.id))
+                other_entry.arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                print('Added link to arxiv paper {} to paper {}'.format(entry.fields['OPTeprint'], other_entry.id))
+                if entry.id not in matched_ids:
+                    matched_ids.add(entry.id)
 
             # if not found, ask the user
-            if entry['ID'] not in matched_ids:
-                same_author_entries = [other_entry for other_entry in bib_database.entries if ('journal' not in other_entry or other_entry['journal'] != 'CoRR') and 'author' in other_entry and other_entry['author'] == entry['author']]
+            if entry.id not in matched_ids:
+                if questions != 'ask':
+                    undecided.append(entry)
+                    continue
+                same_author_entries = [other_entry for other_entry in venue_entries if 'author' in other_entry.fields and other_entry.fields['author'] == entry.fields['author']]
                 
-                print('Did not find a matching title for {} (year {}), titled "{}"'.format(entry['OPTeprint'], entry['year'], entry['title'].replace('\n', ' ')))
+                print('Did not find a matching title for {} (year {}), titled "{}"'.format(entry.fields['OPTeprint'], entry.fields['year'], entry.fields['title'].replace('\n', ' ')))
                 print('Select possible option:')
                 for i in range(len(same_author_entries)):
-                    print('({}) {}: "{}"'.format(i, same_author_entries[i]['ID'], same_author_entries[i]['title'].replace('\n', ' ')))
+                    print('({}) {}: "{}"'.format(i, same_author_entries[i].id, same_author_entries[i].fields['title'].replace('\n', ' ')))
                 i = len(same_author_entries)
                 print('({}) Enter ID manually'.format(i))
                 print('({}) Count this paper as a journal paper'.format(i + 1))
@@ -163,42 +550,74 @@ def gen_html_by_database(bib_database, rename_conferences=False):
                         print('Non-integer input, try again')
                         continue
                     if 0 <= j < i:
-                        same_author_entries[j]['arxiv-link'] = 'https://arxiv.org/{}'.format(entry['volume'])
-                        matched_ids.add(entry['ID'])
+                        same_author_entries[j].arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                        matched_ids.add(entry.id)
+                        decisions[arxiv_number(entry)] = same_author_entries[j].id
                         break
                     elif j == i:
                         print('Enter ID:')
                         paper_id = input()
-                        if paper_id not in [other_entry['ID'] for other_entry in bib_database.entries]:
+                        if paper_id not in entries_by_id:
                             print('ID not found, choose your option again')
                             continue
-                        for other_entry in bib_database.entries:
-                            if other_entry['ID'] == paper_id:
-                                other_entry['arxiv-link'] = 'https://arxiv.org/{}'.format(entry['volume'])
-                                break
+                        entries_by_id[paper_id].arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                        matched_ids.add(entry.id)
+                        decisions[arxiv_number(entry)] = paper_id
                         break
                     elif j == i + 1:
+                        decisions[arxiv_number(entry)] = 'journal'
                         break
                     elif j == i + 2:
-                        matched_ids.add(entry['ID'])
-                        entry['arxiv-link'] = 'https://arxiv.org/{}'.format(entry['volume'])
+                        matched_ids.add(entry.id)
+                        entry.arxiv_link = 'https://arxiv.org/{}'.format(entry.fields['volume'])
+                        decisions[arxiv_number(entry)] = 'hide'
                         break
                     else:
                         print('Input is not a correct number, try again')
                         continue
 
+    for entry in undecided:
+        print('{}: no matching paper for arXiv paper {} (year {}), titled "{}"'.format('ERROR' if questions == 'fail' else 'WARNING', 
+              arxiv_number(entry), entry.fields['year'], entry.fields['title'].replace('\n', ' ')))
+    if undecided and questions == 'fail':
+        raise UndecidedArxivPapers('{} arXiv papers are not matched, add them to the decision file'.format(len(undecided)))
+
     # Filtering the rest of entries we need
-    entries = [entry for entry in bib_database.entries if 'journal' not in entry or entry['journal'] != 'CoRR' or entry['ID'] not in matched_ids]
+    return [entry for entry in entries if entry.fields.get('journal') != 'CoRR' or entry.id not in matched_ids]
 
-    # Fixing the titles and authors for HTML-readable format
-    def latex_to_html(title):
-        return tex_converter.latex_to_text(title).encode('ascii', 'xmlcharrefreplace').decode()
-        
-    for entry in entries:
-        entry['title'] = latex_to_html(entry['title'])
-        if 'author' in entry:
-            entry['author'] = latex_to_html(entry['author'])
+# The script for the lazy publications (see render_publications): the bibtex items of a year
+# are downloaded when the first of them is opened, and a collapsed year when it is expanded
+lazy_publications_script = '''                <script>
+                    var bibtex_years = {};
+
+                    function show_bibtex(id, year) {
+                        var pre = document.getElementById(id).getElementsByTagName('pre')[0];
+                        if (pre.textContent == '') {
+                            if (!(year in bibtex_years)) {
+                                bibtex_years[year] = fetch('bibtex/' + year + '.json').then(function(response) { return response.json(); });
+                            }
+                            bibtex_years[year].then(function(items) { pre.textContent = items[id]; });
+                        }
+                        show(id);
+                    }
 
+                    function load_year(details) {
+                        if (details.open && details.dataset.src) {
+                            fetch(details.dataset.src).then(function(response) { return response.text(); }).then(function(html) {
+                                details.insertAdjacentHTML('beforeend', html);
+                            });
+                            delete details.dataset.src;
+                        }
+                    }
+                </script>
+'''
+
+# If files is a dictionary, the publications are made lazy: the bibtex items are not put into 
+# the page, but into files['bibtex/<year>.json'], and if collapse_years is given, only the 
+# publications of the last collapse_years years are in the page, and the other years are 
+# collapsed and their lists are in files['publications/<year>.html']. 
+# These files should be put next to the page.
+def render_publications(entries, files=None, collapse_years=None):
     # now we are actually making a text for bibitem
     def authors(bib_authors):
         authors_list = [s.strip() for s in bib_authors.split(' and\n')]
@@ -210,54 +629,62 @@ def gen_html_by_database(bib_database, rename_conferences=False):
             authors_list[-1] = 'and ' + authors_list[-1]
             return ', '.join(authors_list)
 
-    def text(entry):
-        if entry['ENTRYTYPE'] == 'inproceedings':
+    # the titles and authors are converted to HTML-readable format only here
+    def text(publication):
+        entry = publication.fields
+        title = latex_to_html(entry['title'])
+        if publication.entry_type == 'inproceedings':
             if 'pages' not in entry:
                 pages = ''
             elif entry['pages'] == 'to appear':
                 pages = ', to appear'
             else: 
                 pages = ', pp. {}'.format(entry['pages'].replace('--', '&mdash;'))
-            return '<i>{}.</i> {}. In <i>{}</i>{}. {}.'.format(authors(entry['author']), entry['title'], re.sub(r'[\{\}]', '', entry['booktitle']), pages, re.sub(r'[\{\}]', '', entry['publisher']).replace('\\\"u', '&uuml') + ', ' + entry['year'] if 'publisher' in entry else entry['year'])
-        elif entry['ENTRYTYPE'] == 'article':
+            return '<i>{}.</i> {}. In <i>{}</i>{}. {}.'.format(authors(latex_to_html(entry['author'])), title, re.sub(r'[\{\}]', '', entry['booktitle']), pages, re.sub(r'[\{\}]', '', entry['publisher']).replace('\\\"u', '&uuml') + ', ' + entry['year'] if 'publisher' in entry else entry['year'])
+        elif publication.entry_type == 'article':
             journal = re.sub(r'([^\\]|^)[{}]', r'\1', entry['journal'])
             if 'pages' in entry:
-                return '<i>{}.</i> {}. <i>{}</i>, {}:{}, {}.'.format(authors(entry['author']), entry['title'], journal, entry['volume'], entry['pages'].replace('--', '&mdash;'), entry['year'])
+                return '<i>{}.</i> {}. <i>{}</i>, {}:{}, {}.'.format(authors(latex_to_html(entry['author'])), title, journal, entry['volume'], entry['pages'].replace('--', '&mdash;'), entry['year'])
             elif journal == 'CoRR':
-                return '<i>{}.</i> {}. <i>{}</i>, {}, {}.'.format(authors(entry['author']), entry['title'], journal, entry['volume'], entry['year'])
+                return '<i>{}.</i> {}. <i>{}</i>, {}, {}.'.format(authors(latex_to_html(entry['author'])), title, journal, entry['volume'], entry['year'])
             else:
-                return '<i>{}.</i> {}. <i>{}</i>, {}.'.format(authors(entry['author']), entry['title'], journal, entry['year'])
-        elif entry['ENTRYTYPE'] == 'incollection':
+                return '<i>{}.</i> {}. <i>{}</i>, {}.'.format(authors(latex_to_html(entry['author'])), title, journal, entry['year'])
+        elif publication.entry_type == 'incollection':
             if 'publisher' not in entry:
                 publisher = ''
             else:
                 publisher = entry['publisher'] + ' '
-            return '<i>{}.</i> {}. In <i>{}</i>, {}, {} {}.'.format(authors(entry['author']), entry['title'], entry['booktitle'], entry['series'], publisher, entry['year'])
-        elif entry['ENTRYTYPE'] == 'book':
+            return '<i>{}.</i> {}. In <i>{}</i>, {}, {} {}.'.format(authors(latex_to_html(entry['author'])), title, entry['booktitle'], entry['series'], publisher, entry['year'])
+        elif publication.entry_type == 'book':
             if 'publisher' not in entry:
                 publisher = ''
             else:
                 publisher = entry['publisher'] + ' '
-            return '<i>{} (editors).</i> {}. {}, {}{}, ISBN {}'.format(authors(entry['editor']), entry['title'], entry['series'], publisher, entry['year'], entry['isbn'])
+            return '<i>{} (editors).</i> {}. {}, {}{}, ISBN {}'.format(authors(entry['editor']), title, entry['series'], publisher, entry['year'], entry['isbn'])
         else:
-            print('ERROR: no support this type of entries: {}'.format([entry['ENTRYTYPE']]))
+            print('ERROR: no support this type of entries: {}'.format([publication.entry_type]))
+
 
+    bibtex_items = dict()
 
     def print_entry_html(entry):
+        if files is not None:
+            bibtex_items.setdefault(entry.fields['year'], dict())[entry.id] = entry.bibtex()
         s = """                <div class="list-row">
                         <div class="list-item">
                             """
-        if 'arxiv-link' in entry:
-            s += '<a href="{}", target="_blank"><img src="images/arxiv-icon.svg" alt="arxiv icon", height="20px"></a>\n                        '.format(entry['arxiv-link'])
+        if entry.arxiv_link is not None:
+            s += '<a href="{}", target="_blank"><img src="images/arxiv-icon.svg" alt="arxiv icon", height="20px"></a>\n                        '.format(entry.arxiv_link)
         s += """                        <div class="bibtex-button">
-                                <img class="image-button" src="images/bibtex.png" alt="bibtex icon" height="20px" onclick="show('{}')" title="Open bibtex item">
+                                <img class="image-button" src="images/bibtex.png" alt="bibtex icon" height="20px" onclick="{}" title="Open bibtex item">
                                 <div class="bibtex-window bibtex-window-colors" id="{}">
     <pre>{}</pre>
                                 </div>    
                             </div>
-                            """.format(entry['ID'], entry['ID'], entry['bibstr'])
-        if 'OPTurl' in entry:
-            s += '<a href="{}", target="_blank"><img src="images/doi.png" alt="doi icon", height="20px"></a>\n                        '.format(entry['OPTurl'].replace('\_', '_'))
+                            """.format("show('{}')".format(entry.id) if files is None else "show_bibtex('{}', '{}')".format(entry.id, entry.fields['year']),
+                                       entry.id, entry.bibtex() if files is None else '')
+        if 'OPTurl' in entry.fields:
+            s += '<a href="{}", target="_blank"><img src="images/doi.png" alt="doi icon", height="20px"></a>\n                        '.format(entry.fields['OPTurl'].replace('\_', '_'))
         s += """</div>
                         <div class="list-description">{}</div>
                     </div>
@@ -266,27 +693,38 @@ def gen_html_by_database(bib_database, rename_conferences=False):
 
     years = dict()
     for entry in entries:
-        year = entry['year']
+        year = entry.fields['year']
         if year not in years:
             years[year] = dict()
-        entry_type = entry['ENTRYTYPE']
+        entry_type = entry.entry_type
         if entry_type != 'inproceedings' and entry_type != 'article':
             entry_type = 'book'
-        if entry_type == 'article' and entry['journal'] == 'CoRR':
+        if entry_type == 'article' and entry.fields['journal'] == 'CoRR':
             entry_type = 'arxiv'
         if entry_type not in years[year]:
             years[year][entry_type] = [entry]
         else:
             years[year][entry_type].append(entry)
 
-    s = ""
-    for year in reversed(sorted(list(years.keys()))):
-        s += '{}<h2>{}</h2>\n'.format(' ' * 16, year)
+    # the parts are joined once, adding them one by one to a string is quadratic
+    parts = []
+    if files is not None:
+        parts.append(lazy_publications_script)
+    for year_number, year in enumerate(reversed(sorted(list(years.keys())))):
+        year_parts = []
         for entry_type, header_entry_type in ('article', 'Journal papers'), ('inproceedings', 'Conference papers'), ('arxiv', 'arXiv papers'), ('book', 'Books, bookchapters and other'):
             if entry_type in years[year]:
-                s += '{}<h3>{}</h3>\n'.format(' ' * 16, header_entry_type)
+                year_parts.append('{}<h3>{}</h3>\n'.format(' ' * 16, header_entry_type))
                 for entry in years[year][entry_type]:
-                    s += print_entry_html(entry)
-    return s
+                    year_parts.append(print_entry_html(entry))
+        if files is not None and collapse_years is not None and year_number >= collapse_years:
+            files['publications/{}.html'.format(year)] = ''.join(year_parts)
+            parts.append('{}<details class="publications-year" data-src="publications/{}.html" ontoggle="load_year(this)"><summary><h2 style="display:inline">{}</h2></summary></details>\n'.format(' ' * 16, year, year))
+        else:
+            parts.append('{}<h2>{}</h2>\n'.format(' ' * 16, year))
+            parts.extend(year_parts)
+    for year, items in bibtex_items.items():
+        files['bibtex/{}.json'.format(year)] = json.dumps(items)
+    return ''.join(parts)
 
 
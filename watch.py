@@ -0,0 +1,102 @@
+import time
+import threading
+from os import stat
+from os.path import isdir, join
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+# Watch mode: the generator stays in memory (with the imported modules, the template and
+# the fragments of the page), checks the modification times of the input files several
+# times per second and rebuilds the page when one of them changes. Since the fragments
+# are kept, only the changed sections are rendered again.
+def file_states(filenames):
+    states = dict()
+    for filename in filenames:
+        try:
+            file_stat = stat(filename)
+            states[filename] = (file_stat.st_mtime_ns, file_stat.st_size)
+        except OSError:
+            states[filename] = None
+    return states
+
+# rebuild is called with the list of changed files
+def watch(filenames, rebuild, interval=0.2):
+    states = file_states(filenames)
+    print('Watching {} for changes, press Ctrl+C to stop'.format(', '.join(filenames)))
+    try:
+        while True:
+            time.sleep(interval)
+            new_states = file_states(filenames)
+            changed = [filename for filename in filenames if new_states[filename] != states[filename]]
+            if changed:
+                states = new_states
+                rebuild(changed)
+    except KeyboardInterrupt:
+        pass
+
+
+# The preview server serves the folder with the page and adds a script to the HTML pages,
+# which asks the server for the number of the last build and reloads the page when it changes
+builds = 0
+
+def build_finished():
+    global builds
+    builds += 1
+
+reload_script = '''<script>
+    var preview_build = null;
+    setInterval(function() {
+        fetch('/__build').then(function(response) { return response.text(); }).then(function(build) {
+            if (preview_build !== null && build != preview_build) {
+                location.reload();
+            }
+            preview_build = build;
+        });
+    }, 300);
+</script>
+'''
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?')[0].split('#')[0]
+        if path == '/__build':
+            self.send_text(str(builds), 'text/plain')
+            return
+        filename = self.translate_path(path)
+        if isdir(filename):
+            filename = join(filename, 'index.html')
+        if filename.endswith('.html'):
+            try:
+                with open(filename, 'r') as f:
+                    html = f.read()
+            except OSError:
+                self.send_error(404)
+                return
+            # the fragments of the collapsed publications are not whole pages
+            if '</body>' in html:
+                html = html.replace('</body>', reload_script + '</body>', 1)
+            self.send_text(html, 'text/html')
+            return
+        super().do_GET()
+
+    def send_text(self, text, content_type):
+        data = text.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # the browser should always ask for the current version of the files
+    def end_headers(self):
+        self.send_header('Cache-Control', 'no-store')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(folder, port=8000):
+    server = ThreadingHTTPServer(('localhost', port), partial(PreviewHandler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print('The preview is at http://localhost:{}/'.format(port))
+    return server